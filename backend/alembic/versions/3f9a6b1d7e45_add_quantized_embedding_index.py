@@ -0,0 +1,53 @@
+"""add quantized embedding index
+
+Revision ID: 3f9a6b1d7e45
+Revises: e7c05d9a2f16
+Create Date: 2026-10-18 12:41:55.093126
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import get_settings
+from app.models import embedding_index_options
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a6b1d7e45'
+down_revision: Union[str, None] = 'e7c05d9a2f16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+QUANTIZED_INDEXES = {
+    'halfvec': (
+        'ix_document_chunks_embedding_halfvec',
+        '(embedding::halfvec(384)) halfvec_cosine_ops',
+    ),
+    'binary': (
+        'ix_document_chunks_embedding_binary',
+        '(binary_quantize(embedding)::bit(384)) bit_hamming_ops',
+    ),
+}
+
+
+def upgrade() -> None:
+    # Only the compact form used by VECTOR_SEARCH_MODE is indexed; full-precision
+    # vectors stay in the table for re-ranking.
+    mode = get_settings().VECTOR_SEARCH_MODE
+    if mode not in QUANTIZED_INDEXES:
+        return
+
+    name, expression = QUANTIZED_INDEXES[mode]
+    options = embedding_index_options()
+    with_clause = ", ".join(f"{key} = {value}" for key, value in options['postgresql_with'].items())
+    op.execute(
+        f"CREATE INDEX IF NOT EXISTS {name} ON document_chunks "
+        f"USING {options['postgresql_using']} ({expression}) WITH ({with_clause})"
+    )
+
+
+def downgrade() -> None:
+    for name, _ in QUANTIZED_INDEXES.values():
+        op.execute(f"DROP INDEX IF EXISTS {name}")
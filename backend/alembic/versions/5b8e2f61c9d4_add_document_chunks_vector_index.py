@@ -0,0 +1,38 @@
+"""add document_chunks vector index
+
+Revision ID: 5b8e2f61c9d4
+Revises: 251978084751
+Create Date: 2026-10-18 09:12:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.models import embedding_index_options
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e2f61c9d4'
+down_revision: Union[str, None] = '251978084751'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_document_chunks_document_id'), 'document_chunks', ['document_id'], unique=False)
+    # hnsw by default, ivfflat when VECTOR_INDEX_TYPE=ivfflat
+    op.create_index(
+        'ix_document_chunks_embedding',
+        'document_chunks',
+        ['embedding'],
+        unique=False,
+        postgresql_ops={'embedding': 'vector_cosine_ops'},
+        **embedding_index_options(),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_document_chunks_embedding', table_name='document_chunks')
+    op.drop_index(op.f('ix_document_chunks_document_id'), table_name='document_chunks')
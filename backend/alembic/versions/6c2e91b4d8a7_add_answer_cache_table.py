@@ -0,0 +1,51 @@
+"""add answer_cache table
+
+Revision ID: 6c2e91b4d8a7
+Revises: a2d8c4f0b913
+Create Date: 2026-10-18 14:08:40.331902
+
+"""
+from typing import Sequence, Union
+from pgvector.sqlalchemy import VECTOR
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6c2e91b4d8a7'
+down_revision: Union[str, None] = 'a2d8c4f0b913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('answer_cache',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('document_id', sa.UUID(), nullable=True),
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('question', sa.Text(), nullable=False),
+    sa.Column('question_embedding', VECTOR(dim=384), nullable=False),
+    sa.Column('answer', sa.Text(), nullable=False),
+    sa.Column('hit_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_used_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_answer_cache_document_id'), 'answer_cache', ['document_id'], unique=False)
+    op.create_index(op.f('ix_answer_cache_last_used_at'), 'answer_cache', ['last_used_at'], unique=False)
+    op.create_index(
+        'ix_answer_cache_question_embedding',
+        'answer_cache',
+        ['question_embedding'],
+        unique=False,
+        postgresql_using='hnsw',
+        postgresql_ops={'question_embedding': 'vector_cosine_ops'},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_answer_cache_question_embedding', table_name='answer_cache')
+    op.drop_index(op.f('ix_answer_cache_last_used_at'), table_name='answer_cache')
+    op.drop_index(op.f('ix_answer_cache_document_id'), table_name='answer_cache')
+    op.drop_table('answer_cache')
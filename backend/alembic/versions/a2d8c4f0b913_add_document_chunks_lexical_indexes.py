@@ -0,0 +1,39 @@
+"""add document_chunks lexical indexes
+
+Revision ID: a2d8c4f0b913
+Revises: 3f9a6b1d7e45
+Create Date: 2026-10-18 13:30:12.558740
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a2d8c4f0b913'
+down_revision: Union[str, None] = '3f9a6b1d7e45'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        'ix_document_chunks_content_trgm',
+        'document_chunks',
+        ['content'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'content': 'gin_trgm_ops'},
+    )
+    op.execute(
+        "CREATE INDEX ix_document_chunks_content_fts ON document_chunks "
+        "USING gin (to_tsvector('simple'::regconfig, content))"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_document_chunks_content_fts', table_name='document_chunks')
+    op.drop_index('ix_document_chunks_content_trgm', table_name='document_chunks')
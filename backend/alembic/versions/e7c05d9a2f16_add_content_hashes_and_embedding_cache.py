@@ -0,0 +1,42 @@
+"""add content hashes and embedding cache
+
+Revision ID: e7c05d9a2f16
+Revises: 8d41a7c3e0b2
+Create Date: 2026-10-18 11:26:09.718342
+
+"""
+from typing import Sequence, Union
+from pgvector.sqlalchemy import VECTOR
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7c05d9a2f16'
+down_revision: Union[str, None] = '8d41a7c3e0b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('embedding_cache',
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('embedding', VECTOR(dim=384), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('content_hash', 'model')
+    )
+    op.add_column('documents', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_documents_content_hash'), 'documents', ['content_hash'], unique=False)
+    op.add_column('document_chunks', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.execute(
+        "UPDATE document_chunks "
+        "SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex')"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('document_chunks', 'content_hash')
+    op.drop_index(op.f('ix_documents_content_hash'), table_name='documents')
+    op.drop_column('documents', 'content_hash')
+    op.drop_table('embedding_cache')
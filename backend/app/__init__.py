@@ -1,3 +1,11 @@
-from .main import app
-
 __all__ = ["app"]
+
+
+def __getattr__(name: str):
+    # Imported lazily so that worker processes spawned for text extraction
+    # can import app.services.* without loading the whole API (and torch).
+    if name == "app":
+        from .main import app
+
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -17,16 +17,76 @@ class Settings(BaseSettings):
     
     APP_NAME: str = "smart-backend"
     DEBUG: bool = False
+    # Uvicorn worker processes (set by entrypoint.sh). DB_POOL_SIZE,
+    # DB_MAX_OVERFLOW, OLLAMA_MAX_CONCURRENT, OLLAMA_MAX_QUEUE,
+    # INGESTION_WORKERS and EXTRACTION_PROCESSES are totals for the host, and
+    # each worker gets an equal share of them (see per_worker).
+    API_WORKERS: int = 1
 
     POSTGRES_USER: str = "smart"
     POSTGRES_PASSWORD: str = "smart"
     POSTGRES_DB: str = "smart"
     POSTGRES_HOST: str = "postgres"
     POSTGRES_PORT: int = 5432
+    # Optional streaming replica for list and search queries; same credentials.
+    POSTGRES_REPLICA_HOST: str | None = None
+    POSTGRES_REPLICA_PORT: int | None = None
+
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 30000  # 0 disables
+    DB_STATEMENT_CACHE_SIZE: int = 100  # 0 behind PgBouncer in transaction mode
 
     upload_doc_dir: Path = Path("/app/uploads/documents")
+    UPLOAD_MAX_BYTES: int = 100 * 1024 * 1024
+    UPLOAD_SNIFF_BYTES: int = 8192
+    UPLOAD_BATCH_MAX_FILES: int = 500
 
     EMBEDDING_MODEL_PATH: str = "/app/models/MiniLM-L12-V2"
+    EMBEDDING_BACKEND: str = "torch"  # torch | onnx
+    EMBEDDING_ONNX_FILE: str | None = None
+    EMBEDDING_WARMUP_BATCH_SIZE: int = 8
+    EMBEDDING_CACHE_LRU_SIZE: int = 10000
+    EMBEDDING_MAX_BATCH_SIZE: int = 64
+    EMBEDDING_MAX_WAIT_MS: float = 10.0
+    # Unix socket of app.embedding_worker; when set, API processes embed
+    # through it and load only the tokenizer.
+    EMBEDDING_WORKER_SOCKET: Path | None = None
+    EMBEDDING_WORKER_TIMEOUT_SECONDS: float = 60.0
+
+    CHUNKING_STRATEGY: str = "token"  # paragraph | token | sentence | clause
+    CHUNK_MAX_TOKENS: int | None = None  # defaults to the model's max_seq_length
+    CHUNK_OVERLAP_TOKENS: int = 24
+    CHUNK_MAX_CHARS: int = 1200  # paragraph strategy
+    CHUNK_OVERLAP_CHARS: int = 200
+
+    INGESTION_WORKERS: int = 2
+    INGESTION_POLL_INTERVAL_SECONDS: float = 2.0
+    INGESTION_JOB_LEASE_SECONDS: int = 120
+    INGESTION_MAX_ATTEMPTS: int = 3
+    INGESTION_PIPELINE_MAX_FILES: int = 16  # batch files one worker ingests together
+
+    EXTRACTION_PROCESSES: int = 2
+    EXTRACTION_PAGES_PER_TASK: int = 8
+    INGESTION_EMBED_BATCH_SIZE: int = 64
+    CHUNK_INSERT_BATCH_SIZE: int = 1000
+
+    RETRIEVAL_TOP_K: int = 5
+    VECTOR_INDEX_TYPE: str = "hnsw"  # hnsw | ivfflat
+    VECTOR_ITERATIVE_SCAN: str = "relaxed_order"  # off | relaxed_order | strict_order
+    HNSW_M: int = 16
+    HNSW_EF_CONSTRUCTION: int = 64
+    HNSW_EF_SEARCH: int = 40
+    IVFFLAT_LISTS: int = 100
+    IVFFLAT_PROBES: int = 10
+    HYBRID_LEXICAL_WEIGHT: float = 0.5  # 0 = vector only, 1 = lexical only
+    HYBRID_CANDIDATES: int = 20
+    HYBRID_RRF_K: int = 60
+    VECTOR_SEARCH_MODE: str = "full"  # full | halfvec | binary
+    VECTOR_RERANK_CANDIDATES: int = 40
 
     @property
     def database_url(self) -> str:
@@ -36,14 +96,66 @@ class Settings(BaseSettings):
             f"{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
         )
 
+    @property
+    def replica_database_url(self) -> str | None:
+        if not self.POSTGRES_REPLICA_HOST:
+            return None
+        return (
+            f"postgresql+asyncpg://{self.POSTGRES_USER}:"
+            f"{self.POSTGRES_PASSWORD}@{self.POSTGRES_REPLICA_HOST}:"
+            f"{self.POSTGRES_REPLICA_PORT or self.POSTGRES_PORT}/{self.POSTGRES_DB}"
+        )
+
     OLLAMA_HOST: str = "ollama"
     OLLAMA_PORT: int = 11434
     OLLAMA_MODEL_NAME: str = "qwen3-0.6b"
+    OLLAMA_TIMEOUT_SECONDS: float = 60.0
+    OLLAMA_MAX_CONNECTIONS: int = 10
+    OLLAMA_MAX_KEEPALIVE_CONNECTIONS: int = 5
+    OLLAMA_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    OLLAMA_MAX_CONCURRENT: int = 2
+    OLLAMA_MAX_QUEUE: int = 8
+    OLLAMA_QUEUE_TIMEOUT_SECONDS: float = 30.0
+    OLLAMA_RETRY_AFTER_SECONDS: int = 5
+
+    CHAT_TOKENIZER_PATH: str | None = "/app/models/Qwen3-0.6B/tokenizer.json"  # tokenizer.json of the chat model
+    CHAT_HISTORY_TOKEN_BUDGET: int = 512
+    CHAT_HISTORY_MAX_MESSAGES: int = 20
+    CHAT_SUMMARY_KEEP_RECENT: int = 4
+    CHAT_SUMMARY_MIN_MESSAGES: int = 4
+    CHAT_SUMMARY_MAX_TOKENS: int = 200
+    # Chat messages are written behind the response in batches; a batch is
+    # flushed once it holds MESSAGE_SINK_MAX_BATCH_SIZE rows or its oldest row
+    # has waited MESSAGE_SINK_FLUSH_INTERVAL_MS.
+    MESSAGE_SINK_MAX_BATCH_SIZE: int = 256
+    MESSAGE_SINK_FLUSH_INTERVAL_MS: float = 50.0
+
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.95
+    ANSWER_CACHE_TTL_SECONDS: int = 86400
+    ANSWER_CACHE_MAX_ENTRIES: int = 10000
+    ANSWER_CACHE_EVICT_EVERY: int = 50
+
+    TRACING_ENABLED: bool = True
+    TRACE_EXPORT_FILE: Path | None = None  # JSON lines, one trace per line
+    TRACE_OTLP_ENDPOINT: str | None = None  # e.g. http://otel-collector:4318/v1/traces
+    TRACE_SERVICE_NAME: str = "smart-backend"
 
     @property
     def ollama_base_url(self) -> str:
         return f"http://{self.OLLAMA_HOST}:{self.OLLAMA_PORT}"
 
+    def per_worker(self, total: int) -> int:
+        """One API worker's share of a host-wide budget; at least 1 unless the budget is 0."""
+        if total <= 0:
+            return 0
+        return max(total // max(self.API_WORKERS, 1), 1)
+
+    def oversubscribed_budgets(self) -> list[str]:
+        """Budgets too small to split across API_WORKERS; every worker still gets 1."""
+        budgets = ("DB_POOL_SIZE", "OLLAMA_MAX_CONCURRENT", "INGESTION_WORKERS", "EXTRACTION_PROCESSES")
+        return [name for name in budgets if 0 < getattr(self, name) < self.API_WORKERS]
+
 
 @lru_cache(maxsize=1)
 def get_settings() -> Settings:
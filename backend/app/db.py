@@ -1,3 +1,4 @@
+import time
 from typing import AsyncGenerator
 
 from sqlalchemy import text
@@ -8,8 +9,10 @@ from sqlalchemy.ext.asyncio import (
     create_async_engine,
 )
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from .config import get_settings
+from .metrics import DB_POOL_CHECKOUT_SECONDS, observe_pool, register_engine
 
 
 class Base(DeclarativeBase):
@@ -18,11 +21,64 @@ class Base(DeclarativeBase):
 
 settings = get_settings()
 
-engine: AsyncEngine = create_async_engine(
-    settings.database_url,
-    echo=settings.DEBUG,
-    future=True,
-)
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Records how long each connection checkout takes, so pool starvation shows up in /metrics."""
+
+    metrics_label = "primary"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.labels(pool=self.metrics_label).observe(time.perf_counter() - started)
+            observe_pool(self.metrics_label, self)
+
+    def _do_return_conn(self, record) -> None:
+        super()._do_return_conn(record)
+        observe_pool(self.metrics_label, self)
+
+
+class TimedReplicaQueuePool(TimedAsyncQueuePool):
+    metrics_label = "replica"
+
+
+def _create_engine(url: str, poolclass, read_only: bool = False) -> AsyncEngine:
+    server_settings = {"application_name": settings.APP_NAME}
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        server_settings["statement_timeout"] = str(settings.DB_STATEMENT_TIMEOUT_MS)
+    if read_only:
+        # A misrouted write fails loudly instead of landing on the wrong server.
+        server_settings["default_transaction_read_only"] = "on"
+    return create_async_engine(
+        url,
+        echo=settings.DEBUG,
+        future=True,
+        poolclass=poolclass,
+        pool_size=settings.per_worker(settings.DB_POOL_SIZE),
+        max_overflow=settings.per_worker(settings.DB_MAX_OVERFLOW),
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={
+            # asyncpg's own statement cache and SQLAlchemy's prepared statement
+            # cache both have to be off behind PgBouncer in transaction mode.
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "server_settings": server_settings,
+        },
+    )
+
+
+engine: AsyncEngine = _create_engine(settings.database_url, TimedAsyncQueuePool)
+register_engine("primary", engine)
+
+# Without a replica, reads share the primary engine and its pool.
+read_engine: AsyncEngine = engine
+if settings.replica_database_url:
+    read_engine = _create_engine(settings.replica_database_url, TimedReplicaQueuePool, read_only=True)
+    register_engine("replica", read_engine)
 
 async_session_factory = async_sessionmaker(
     bind=engine,
@@ -30,12 +86,30 @@ async_session_factory = async_sessionmaker(
     expire_on_commit=False,
 )
 
+read_session_factory = async_sessionmaker(
+    bind=read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+)
+
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session_factory() as session:
         yield session
 
 
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    """Session for read-only endpoints; may lag the primary when a replica is configured."""
+    async with read_session_factory() as session:
+        yield session
+
+
+async def dispose_engines() -> None:
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
+
+
 async def ping_database() -> None:
     async with engine.connect() as conn:
         await conn.execute(text("SELECT 1"))
@@ -0,0 +1,104 @@
+"""Standalone embedding worker shared by every API process on the host.
+
+Owns the embedding model and its CPU threads, and serves embed requests over
+the Unix socket at EMBEDDING_WORKER_SOCKET using the framing in
+app.services.embedding_client. Requests from all connections go through one
+EmbeddingBatcher, so concurrent API workers share model batches:
+
+    EMBEDDING_WORKER_SOCKET=/tmp/embedding.sock python -m app.embedding_worker
+"""
+import asyncio
+import signal
+from pathlib import Path
+from typing import Any, Dict, Set
+
+from loguru import logger
+
+from .config import get_settings
+from .logging_config import setup_logging
+from app.services.embedding import embedding_batcher
+from app.services.embedding_client import pack_vectors, read_frame, write_frame
+from app.services.model_registry import model_registry
+
+settings = get_settings()
+
+
+async def _handle(header: Dict[str, Any]) -> tuple[Dict[str, Any], bytes]:
+    request_id = header.get("id")
+    try:
+        op = header.get("op")
+        if op == "embed":
+            vectors = await embedding_batcher.embed(header["texts"])
+            dim, payload = pack_vectors(vectors)
+            return {"id": request_id, "count": len(vectors), "dim": dim}, payload
+        if op == "stats":
+            return {"id": request_id, "stats": embedding_batcher.stats()}, b""
+        return {"id": request_id, "error": f"Unknown op: {op!r}"}, b""
+    except Exception as exc:  # noqa: BLE001
+        return {"id": request_id, "error": f"{type(exc).__name__}: {exc}"}, b""
+
+
+async def _serve_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    write_lock = asyncio.Lock()
+    tasks: Set[asyncio.Task] = set()
+
+    async def respond(header: Dict[str, Any]) -> None:
+        response, payload = await _handle(header)
+        try:
+            async with write_lock:
+                write_frame(writer, response, payload)
+                await writer.drain()
+        except ConnectionError:
+            pass
+
+    try:
+        while True:
+            header, _ = await read_frame(reader)
+            # Requests on one connection are answered as they finish, so a
+            # slow batch does not hold up the ones queued behind it.
+            task = asyncio.create_task(respond(header))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    except Exception as exc:  # noqa: BLE001
+        logger.warning(f"Dropping embedding client connection: {exc!r}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        writer.close()
+
+
+async def serve(socket_path: Path) -> None:
+    await asyncio.to_thread(model_registry.load)
+    embedding_batcher.start()
+
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    socket_path.unlink(missing_ok=True)
+    server = await asyncio.start_unix_server(_serve_connection, path=str(socket_path))
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+
+    logger.info(f"Embedding worker listening on {socket_path}")
+    try:
+        async with server:
+            await stopping.wait()
+    finally:
+        await embedding_batcher.stop()
+        socket_path.unlink(missing_ok=True)
+        model_registry.unload()
+        logger.info("Embedding worker stopped")
+
+
+def main() -> None:
+    setup_logging()
+    if not settings.EMBEDDING_WORKER_SOCKET:
+        raise SystemExit("EMBEDDING_WORKER_SOCKET is not set")
+    asyncio.run(serve(Path(settings.EMBEDDING_WORKER_SOCKET)))
+
+
+if __name__ == "__main__":
+    main()
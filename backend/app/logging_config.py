@@ -1,8 +1,11 @@
 from loguru import logger
 
+from app.tracing import add_log_context
+
 
 def setup_logging() -> None:
     logger.remove()
+    logger.configure(extra={"request_id": "-"}, patcher=add_log_context)
     logger.add(
         sink="stdout",
         level="INFO",
@@ -12,6 +15,7 @@ def setup_logging() -> None:
         colorize=True,
         format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | "
         "<level>{level: <8}</level> | "
+        "<magenta>{extra[request_id]}</magenta> | "
         "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
         "<level>{message}</level>",
     )
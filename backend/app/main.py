@@ -1,21 +1,85 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
+from loguru import logger
 
 from .config import get_settings
+from .db import dispose_engines
+from .metrics import MetricsMiddleware, render as render_metrics
+from .tracing import TracingMiddleware, exporter as trace_exporter
 from app.routers import chat, document
+from app.services.conversation_memory import get_chat_tokenizer
+from app.services.embedding import embedder, embedding_batcher, embedding_worker_client
+from app.services.extraction import get_executor, shutdown_executor
+from app.services.message_sink import message_sink
+from app.services.model_registry import model_registry
+from app.services.ollama_client import close_client, start_client
+from app.services.retrieval import check_vector_indexes
+from app.services.ingestion import worker_pool
 from .logging_config import setup_logging 
 
 settings = get_settings()
 setup_logging()
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await check_vector_indexes()
+    if oversubscribed := settings.oversubscribed_budgets():
+        logger.warning(
+            f"{', '.join(oversubscribed)} smaller than API_WORKERS={settings.API_WORKERS}; "
+            "each worker still takes 1, so the host exceeds them"
+        )
+    if embedding_worker_client is None:
+        await asyncio.to_thread(model_registry.load)
+    else:
+        await asyncio.to_thread(model_registry.load_tokenizer)
+    app.state.model_registry = model_registry
+    # Loaded up front so a missing tokenizer is reported at startup.
+    await asyncio.to_thread(get_chat_tokenizer)
+    get_executor()
+    embedder.start()
+    start_client()
+    trace_exporter.start()
+    worker_pool.start()
+    message_sink.start()
+    yield
+    await worker_pool.stop()
+    # Write out queued chat messages while the database engine is still up.
+    await message_sink.stop()
+    await close_client()
+    await embedder.stop()
+    shutdown_executor()
+    trace_exporter.stop()
+    model_registry.unload()
+    await dispose_engines()
+
+
 app = FastAPI(
     title="Smart Backend",
     debug=False,
-    root_path="/api"
+    root_path="/api",
+    lifespan=lifespan,
 )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
 app.include_router(chat.router)
 app.include_router(document.router)
 
 @app.get("/health", tags=["health"])
 async def health_check() -> dict:
     return {"status": "ok"}
+
+
+@app.get("/health/embedding", tags=["health"])
+async def embedding_stats() -> dict:
+    if embedding_worker_client is not None:
+        return await embedding_worker_client.worker_stats()
+    return embedding_batcher.stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
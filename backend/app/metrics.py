@@ -0,0 +1,202 @@
+"""Prometheus metrics for the hot paths, served from /metrics.
+
+Metrics are module-level so services can import and observe them directly.
+Under several uvicorn workers set PROMETHEUS_MULTIPROC_DIR to an empty
+directory so every worker's samples are aggregated on scrape.
+"""
+from __future__ import annotations
+import os
+import time
+from typing import Iterable
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+# Ingestion ---------------------------------------------------------------
+
+INGESTION_STAGE_SECONDS = Histogram(
+    "ingestion_stage_seconds",
+    "Time per ingestion step: extract (one page), chunk (one page), embed and insert (one batch).",
+    ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+INGESTION_PAGES_TOTAL = Counter("ingestion_pages", "Pages extracted for ingestion.")
+INGESTION_CHUNKS_TOTAL = Counter("ingestion_chunks", "Chunks stored by ingestion.")
+
+# Embedding ---------------------------------------------------------------
+
+EMBEDDING_BATCH_SIZE = Histogram(
+    "embedding_batch_size",
+    "Texts per model call made by the embedding batcher.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+EMBEDDING_BATCH_SECONDS = Histogram(
+    "embedding_batch_seconds",
+    "Model time per embedding batch.",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+EMBEDDING_QUEUE_DEPTH = Gauge(
+    "embedding_queue_depth", "Texts waiting for the embedding batcher.", multiprocess_mode="livesum"
+)
+
+# Ollama ------------------------------------------------------------------
+
+OLLAMA_TIME_TO_FIRST_TOKEN_SECONDS = Histogram(
+    "ollama_time_to_first_token_seconds",
+    "Time from sending a streaming chat request to its first content token.",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60),
+)
+OLLAMA_TOKENS_PER_SECOND = Histogram(
+    "ollama_tokens_per_second",
+    "Generation speed per completed chat stream (eval_count / eval_duration).",
+    buckets=(1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 200),
+)
+OLLAMA_GENERATED_TOKENS_TOTAL = Counter("ollama_generated_tokens", "Tokens generated by Ollama.")
+OLLAMA_IN_FLIGHT = Gauge(
+    "ollama_in_flight_generations", "Generations holding a limiter slot.", multiprocess_mode="livesum"
+)
+OLLAMA_WAITING = Gauge(
+    "ollama_waiting_requests", "Requests queued for a generation slot.", multiprocess_mode="livesum"
+)
+OLLAMA_REJECTED_TOTAL = Counter("ollama_rejected_requests", "Requests turned away with 503 by the limiter.")
+
+# Database ----------------------------------------------------------------
+
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds",
+    "Time to get a connection from the SQLAlchemy pool, including waiting and connecting.",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+MESSAGE_SINK_QUEUE_DEPTH = Gauge(
+    "message_sink_queue_depth", "Chat writes waiting for the message sink.", multiprocess_mode="livesum"
+)
+MESSAGE_SINK_BATCH_SIZE = Histogram(
+    "message_sink_batch_size",
+    "Rows (conversations and messages) per message sink flush.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512),
+)
+MESSAGE_SINK_FLUSH_SECONDS = Histogram(
+    "message_sink_flush_seconds",
+    "Time per message sink flush, including the commit.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+MESSAGE_SINK_DROPPED_TOTAL = Counter("message_sink_dropped_rows", "Chat rows the message sink failed to write.")
+
+# HTTP --------------------------------------------------------------------
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time from request start to the end of the response body, by route template.",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+
+class PoolCollector(Collector):
+    """Reads SQLAlchemy pool counters at scrape time, one label per engine."""
+
+    GAUGES = (
+        ("db_pool_size", "Configured pool size.", lambda pool: pool.size()),
+        ("db_pool_checked_out", "Connections currently checked out.", lambda pool: pool.checkedout()),
+        ("db_pool_checked_in", "Idle connections in the pool.", lambda pool: pool.checkedin()),
+        ("db_pool_overflow", "Connections opened beyond pool_size.", lambda pool: max(pool.overflow(), 0)),
+    )
+
+    def __init__(self) -> None:
+        self._engines = {}
+
+    def add(self, name: str, engine) -> None:
+        self._engines[name] = engine
+
+    def collect(self) -> Iterable[GaugeMetricFamily]:
+        for metric, doc, read in self.GAUGES:
+            family = GaugeMetricFamily(metric, doc, labels=["pool"])
+            for name, engine in self._engines.items():
+                # engine.pool, not a saved pool: dispose() replaces it.
+                family.add_metric([name], read(engine.pool))
+            yield family
+
+
+_pool_collector = PoolCollector()
+_multiprocess_pool_gauges = [
+    (Gauge(metric, doc, ["pool"], registry=None, multiprocess_mode="livesum"), read)
+    for metric, doc, read in PoolCollector.GAUGES
+] if os.environ.get("PROMETHEUS_MULTIPROC_DIR") else []
+
+
+def observe_pool(name: str, pool) -> None:
+    """Update a pool's gauges after a checkout or checkin.
+
+    Only needed under PROMETHEUS_MULTIPROC_DIR: a multiprocess scrape reads
+    the workers' sample files rather than running PoolCollector, so each
+    worker keeps file-backed gauges current and livesum adds them up.
+    """
+    for gauge, read in _multiprocess_pool_gauges:
+        gauge.labels(name).set(read(pool))
+
+
+def register_engine(name: str, engine) -> None:
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        observe_pool(name, engine.pool)
+        return
+    if not _pool_collector._engines:
+        REGISTRY.register(_pool_collector)
+    _pool_collector.add(name, engine)
+
+
+def render() -> tuple[bytes, str]:
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """Times each HTTP request to its last body byte, labelled by route template.
+
+    A plain ASGI middleware so streaming responses and their background tasks
+    pass through untouched.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the scope; unmatched
+            # paths share one label to keep cardinality bounded.
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status),
+            ).observe(time.perf_counter() - started)
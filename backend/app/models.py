@@ -1,20 +1,67 @@
 import uuid
 from datetime import datetime, timezone
 from sqlalchemy import (
+    cast,
+    func,
+    literal_column,
     Column,
     String,
     Text,
+    Boolean,
     DateTime,
     Integer,
     ForeignKey,
+    Index,
 )
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
-from pgvector.sqlalchemy import Vector
+from pgvector.sqlalchemy import BIT, HALFVEC, Vector
+from .config import get_settings
 from .db import Base
 
 
+settings = get_settings()
+
+
+def embedding_index_options() -> dict:
+    if settings.VECTOR_INDEX_TYPE == "ivfflat":
+        return {
+            "postgresql_using": "ivfflat",
+            "postgresql_with": {"lists": settings.IVFFLAT_LISTS},
+        }
+    return {
+        "postgresql_using": "hnsw",
+        "postgresql_with": {
+            "m": settings.HNSW_M,
+            "ef_construction": settings.HNSW_EF_CONSTRUCTION,
+        },
+    }
+
+
+def quantized_embedding_indexes(embedding: Column) -> tuple:
+    """Expression index on the compact form of embedding used by VECTOR_SEARCH_MODE."""
+    if settings.VECTOR_SEARCH_MODE == "halfvec":
+        return (
+            Index(
+                "ix_document_chunks_embedding_halfvec",
+                cast(embedding, HALFVEC(384)).label("embedding"),
+                postgresql_ops={"embedding": "halfvec_cosine_ops"},
+                **embedding_index_options(),
+            ),
+        )
+    if settings.VECTOR_SEARCH_MODE == "binary":
+        return (
+            Index(
+                "ix_document_chunks_embedding_binary",
+                cast(func.binary_quantize(embedding), BIT(384)).label("embedding"),
+                postgresql_ops={"embedding": "bit_hamming_ops"},
+                **embedding_index_options(),
+            ),
+        )
+    return ()
+
+
 class Document(Base):
     __tablename__ = "documents"
 
@@ -23,7 +70,8 @@ class Document(Base):
     filename = Column(String, nullable=False)
     original_filename = Column(String, nullable=False)
     file_type = Column(String, nullable=False)  # pdf | docx
-    status = Column(String, nullable=False, default="uploaded")
+    content_hash = Column(String(64), index=True)  # sha256 of the file bytes
+    status = Column(String, nullable=False, default="uploaded")  # queued | processing | ready | failed
     uploaded_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     meta_data = Column(Text)
 
@@ -39,6 +87,16 @@ class Document(Base):
         cascade="all, delete-orphan"
     )
 
+    jobs = relationship(
+        "IngestionJob",
+        back_populates="document",
+        cascade="all, delete-orphan"
+    )
+
+    __table_args__ = (
+        Index("ix_documents_uploaded_at_id", "uploaded_at", "id"),
+    )
+
 
 class DocumentChunk(Base):
     __tablename__ = "document_chunks"
@@ -48,11 +106,13 @@ class DocumentChunk(Base):
     document_id = Column(
         UUID(as_uuid=True),
         ForeignKey("documents.id", ondelete="CASCADE"),
-        nullable=False
+        nullable=False,
+        index=True,
     )
 
     chunk_index = Column(Integer, nullable=False)
     content = Column(Text, nullable=False)
+    content_hash = Column(String(64))  # sha256 of content
 
     embedding = Column(Vector(384), nullable=False)
 
@@ -61,6 +121,106 @@ class DocumentChunk(Base):
 
     document = relationship("Document", back_populates="chunks")
 
+    __table_args__ = (
+        Index(
+            "ix_document_chunks_embedding",
+            "embedding",
+            postgresql_ops={"embedding": "vector_cosine_ops"},
+            **embedding_index_options(),
+        ),
+        *quantized_embedding_indexes(embedding),
+        Index(
+            "ix_document_chunks_content_trgm",
+            "content",
+            postgresql_using="gin",
+            postgresql_ops={"content": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_document_chunks_content_fts",
+            func.to_tsvector(literal_column("'simple'::regconfig"), content),
+            postgresql_using="gin",
+        ),
+    )
+
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+
+    content_hash = Column(String(64), primary_key=True)
+    model = Column(String, primary_key=True)
+    embedding = Column(Vector(384), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+
+class AnswerCacheEntry(Base):
+    __tablename__ = "answer_cache"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+
+    document_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("documents.id", ondelete="CASCADE"),
+        nullable=True,
+        index=True,
+    )
+    model = Column(String, nullable=False)
+
+    question = Column(Text, nullable=False)
+    question_embedding = Column(Vector(384), nullable=False)
+    answer = Column(Text, nullable=False)
+
+    hit_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    last_used_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), index=True)
+
+    __table_args__ = (
+        Index(
+            "ix_answer_cache_question_embedding",
+            "question_embedding",
+            postgresql_using="hnsw",
+            postgresql_ops={"question_embedding": "vector_cosine_ops"},
+        ),
+    )
+
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+
+    document_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("documents.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+
+    # Set for files uploaded together through /documents/upload/batch.
+    batch_id = Column(UUID(as_uuid=True), index=True)
+
+    kind = Column(String, nullable=False, default="ingest", server_default="ingest")  # ingest | reingest
+    # reingest: the revised file, and what the document takes from it once applied.
+    source_path = Column(String)
+    source_filename = Column(String)
+    source_hash = Column(String(64))
+
+    status = Column(String, nullable=False, default="queued")  # queued | running | done | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+    page_count = Column(Integer)
+    chunk_count = Column(Integer)
+
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    started_at = Column(DateTime(timezone=True))
+    heartbeat_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+    document = relationship("Document", back_populates="jobs")
+
+    __table_args__ = (
+        Index("ix_ingestion_jobs_status_created_at", "status", "created_at"),
+    )
+
 
 class Conversation(Base):
     __tablename__ = "conversations"
@@ -75,6 +235,10 @@ class Conversation(Base):
 
     started_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
+    # Rolling summary of every message created up to summarized_until.
+    summary = Column(Text)
+    summarized_until = Column(DateTime(timezone=True))
+
     document = relationship("Document", back_populates="conversations")
 
     messages = relationship(
@@ -83,6 +247,10 @@ class Conversation(Base):
         cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        Index("ix_conversations_started_at_id", "started_at", "id"),
+    )
+
 
 class Message(Base):
     __tablename__ = "messages"
@@ -97,7 +265,14 @@ class Message(Base):
 
     role = Column(String, nullable=False)  # user | assistant
     content = Column(Text, nullable=False)
+    # Set when generation stopped early (client disconnect or model failure)
+    # and content holds only the part that was streamed.
+    is_truncated = Column(Boolean, nullable=False, default=False, server_default="false")
 
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
     conversation = relationship("Conversation", back_populates="messages")
+
+    __table_args__ = (
+        Index("ix_messages_conversation_id_created_at", "conversation_id", "created_at", "id"),
+    )
@@ -0,0 +1,35 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import Column, tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(timestamp: datetime, row_id: UUID) -> str:
+    raw = f"{timestamp.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(timestamp), UUID(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+def after_cursor(timestamp_column: Column, id_column: Column, cursor: str, descending: bool = True):
+    """Row-value comparison that continues a (timestamp, id) ordered scan past the cursor."""
+    timestamp, row_id = decode_cursor(cursor)
+    key = tuple_(timestamp_column, id_column)
+    if descending:
+        return key < tuple_(timestamp, row_id)
+    return key > tuple_(timestamp, row_id)
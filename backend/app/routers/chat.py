@@ -1,105 +1,357 @@
-from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+
+import anyio
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import AsyncGenerator, List
+from typing import Any, AsyncGenerator, Dict, List
+from uuid import UUID
+
+import orjson
 
 from sqlalchemy import select
-from sqlalchemy.orm import selectinload
 
-from app.db import get_session
-from app.models import Conversation, Message
+from app.db import async_session_factory, get_read_session, get_session
+from app.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    NEXT_CURSOR_HEADER,
+    after_cursor,
+    encode_cursor,
+)
+from app.models import Conversation, Document, Message
 from app.schemas import MessageCreate, ConversationSchema, ConversationListSchema
+from app.config import get_settings
+from app.services.conversation_memory import build_history, schedule_summary
+from app.services.answer_cache import lookup_answer, replay_answer, store_answer
+from app.services.message_sink import message_sink
+from app.services.embedding import embed_texts
 from app.services.ollama_client import chat_completion
+from app.services.retrieval import format_context, retrieve_context
+from app.tracing import span
 from loguru import logger
 
+settings = get_settings()
 router = APIRouter()
 
 MAX_TITLE_LENGTH = 50
 
+STREAM_MEDIA_TYPES = {
+    "text": "text/plain",
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+def encode_event(stream_format: str, event: str, data: Dict[str, Any]) -> bytes:
+    if stream_format == "sse":
+        return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+    return orjson.dumps({"type": event, **data}) + b"\n"
+
 @router.get("/conversations", response_model=List[ConversationListSchema])
-async def list_conversations(session: AsyncSession = Depends(get_session)):
-    result = await session.execute(select(Conversation))
-    conversations = result.scalars().all()
+async def list_conversations(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    session: AsyncSession = Depends(get_read_session),
+):
+    stmt = (
+        select(
+            Conversation.id,
+            Conversation.document_id,
+            Conversation.started_at,
+            Conversation.title,
+        )
+        .order_by(Conversation.started_at.desc(), Conversation.id.desc())
+        .limit(limit)
+    )
+    if cursor:
+        stmt = stmt.where(after_cursor(Conversation.started_at, Conversation.id, cursor))
+
+    conversations = (await session.execute(stmt)).mappings().all()
+    if len(conversations) == limit:
+        last = conversations[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last["started_at"], last["id"])
     return conversations
 
 
 @router.get("/conversations/{conversation_id}", response_model=ConversationSchema)
-async def get_conversation(conversation_id: str, session: AsyncSession = Depends(get_session)):
+async def get_conversation(
+    conversation_id: UUID,
+    response: Response,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    session: AsyncSession = Depends(get_session),
+):
+    # Messages this process has not written out yet would be missing.
+    await message_sink.sync(conversation_id)
     result = await session.execute(
-        select(Conversation)
-        .options(selectinload(Conversation.messages))
+        select(Conversation.id, Conversation.document_id, Conversation.started_at)
         .where(Conversation.id == conversation_id)
     )
-    conv = result.scalars().first()
+    conv = result.mappings().first()
     if not conv:
         raise HTTPException(status_code=404, detail="Conversation not found.")
-    return conv
+
+    stmt = (
+        select(Message.id, Message.role, Message.content, Message.is_truncated, Message.created_at)
+        .where(Message.conversation_id == conversation_id)
+        .order_by(Message.created_at, Message.id)
+        .limit(limit)
+    )
+    if cursor:
+        stmt = stmt.where(after_cursor(Message.created_at, Message.id, cursor, descending=False))
+
+    messages = (await session.execute(stmt)).mappings().all()
+    if len(messages) == limit:
+        last = messages[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last["created_at"], last["id"])
+    return {**conv, "messages": messages}
 
 
 @router.post("/chat/stream")
 async def chat_stream(
     payload: MessageCreate,
-    session: AsyncSession = Depends(get_session),
+    request: Request,
 ):
-    is_new_conversation = False
     print(payload)
-    if payload.conversation_id:
-        conv = await session.get(Conversation, payload.conversation_id)
-        if not conv:
-            raise HTTPException(status_code=404, detail="Conversation not found.")
+
+    document = None
+    conv = None
+    question_embedding = None
+    cached_answer = None
+    # A short session for the lookups: nothing holds a connection while the
+    # answer streams, and messages are written behind it by the message sink.
+    async with async_session_factory() as session:
+        with span("load"):
+            if payload.document_filename:
+                result = await session.execute(
+                    select(Document).where(Document.filename == payload.document_filename)
+                )
+                document = result.scalars().first()
+                if not document:
+                    raise HTTPException(status_code=404, detail="Document not found.")
+                if document.status != "ready":
+                    raise HTTPException(status_code=409, detail="Document is not ready yet.")
+
+            if payload.conversation_id:
+                # Its previous turn may still be queued in the message sink.
+                await message_sink.sync(payload.conversation_id)
+                conv = await session.get(Conversation, payload.conversation_id)
+                if not conv:
+                    raise HTTPException(status_code=404, detail="Conversation not found.")
+
+        history = await build_history(session, conv) if conv is not None else []
+
+        # Cached answers are only valid without prior turns to condition on.
+        use_answer_cache = settings.ANSWER_CACHE_ENABLED and not history
+
+        if use_answer_cache:
+            [question_embedding] = await embed_texts([payload.question])
+            cached_answer = await lookup_answer(
+                session,
+                document.id if document else None,
+                question_embedding,
+            )
+            if cached_answer is not None:
+                # Keep the hit count and last_used_at that eviction orders by.
+                await session.commit()
+
+    ollama_stream = None
+    if cached_answer is None:
+        system_prompt = (
+            "You are a helpful assistant. "
+            "Always answer in the same language as the user."
+        )
+        final_prompt = f"User question:\n{payload.question}\n\nProvide a concise, well-structured answer."
+
+        if document:
+            chunks = await retrieve_context(
+                document.id,
+                payload.question,
+                lexical_weight=payload.lexical_weight,
+                query_embedding=question_embedding,
+            )
+            if chunks:
+                final_prompt = (
+                    f"Context from the document:\n{format_context(chunks)}\n\n"
+                    f"User question:\n{payload.question}\n\n"
+                    "Answer using the context above and cite page numbers where relevant. "
+                    "Provide a concise, well-structured answer."
+                )
+
+        # Take a generation slot before persisting anything, so a 503 from a
+        # full queue does not leave an unanswered user message behind.
+        ollama_stream = await chat_completion(
+            final_prompt,
+            system_prompt=system_prompt,
+            history=history,
+        )
+        answer_source = ollama_stream.__aiter__()
     else:
-        conv = Conversation(document_id=None)
-        session.add(conv)
-        await session.flush()
-        is_new_conversation = True
-
-    user_message = Message(
-        conversation_id=conv.id,
-        role="user",
-        content=payload.question,
-    )
-    session.add(user_message)
+        answer_source = replay_answer(cached_answer.answer)
+
+    # Wait for the first token before answering, so prefill time is part of
+    # Server-Timing and a model failure is still a proper error response.
+    first_chunk = None
+    try:
+        with span("prefill"):
+            first_chunk = await answer_source.__anext__()
+    except StopAsyncIteration:
+        pass
+    except Exception as exc:
+        if ollama_stream is not None:
+            await ollama_stream.aclose()
+        logger.error(f"Chat generation failed before the first token: {exc}")
+        raise HTTPException(status_code=502, detail="The language model failed to respond.")
 
-    if is_new_conversation:
+    if conv is None:
+        # Written before the response, so the X-Conversation-Id the client
+        # gets back always exists, whichever worker serves its next request.
         if len(payload.question) > MAX_TITLE_LENGTH:
-            conv.title = payload.question[:MAX_TITLE_LENGTH].rstrip() + "..."
+            title = payload.question[:MAX_TITLE_LENGTH].rstrip() + "..."
         else:
-            conv.title = payload.question
+            title = payload.question
+        try:
+            with span("db_commit"):
+                async with async_session_factory() as session:
+                    conv = Conversation(document_id=document.id if document else None, title=title)
+                    session.add(conv)
+                    await session.commit()
+        except Exception:
+            await answer_source.aclose()
+            if ollama_stream is not None:
+                await ollama_stream.aclose()
+            raise
+    conversation_id = conv.id
 
-    await session.commit()
+    # Messages are written behind the response; writes collects whether they landed.
+    _, user_written = message_sink.add_message(conversation_id, "user", payload.question)
+    writes = [user_written]
 
-    system_prompt = (
-        "You are a helpful assistant. "
-        "Always answer in the same language as the user."
-    )
-    final_prompt = f"User question:\n{payload.question}\n\nProvide a concise, well-structured answer."
+    stream_format = payload.format
 
-    ollama_stream = await chat_completion(
-        final_prompt,
-        system_prompt=system_prompt,
-    )
+    async def answer_chunks() -> AsyncGenerator[str, None]:
+        if first_chunk is not None:
+            yield first_chunk
+        async for chunk in answer_source:
+            yield chunk
 
-    async def event_generator() -> AsyncGenerator[str, None]:
-        parts: list[str] = []
+    disconnected = asyncio.Event()
 
-        async for chunk in ollama_stream:
-            parts.append(chunk)
-            yield chunk
+    async def watch_disconnect() -> None:
+        # The request body is already read, so the next message is the
+        # disconnect. Cancelling the stream closes the connection to Ollama,
+        # which stops generating instead of finishing an answer nobody reads.
+        while (await request.receive())["type"] != "http.disconnect":
+            pass
+        disconnected.set()
+        logger.info(f"Client disconnected from conversation {conversation_id}, aborting generation")
+        if ollama_stream is not None:
+            ollama_stream.cancel()
+
+    parts: list[str] = []
+    assistant_message_id = None
 
+    async def save_answer(truncated: bool) -> None:
+        nonlocal assistant_message_id
         final_answer = "".join(parts)
+        if truncated and not final_answer:
+            return
 
-        assistant_message = Message(
-            conversation_id=conv.id,
-            role="assistant",
-            content=final_answer,
+        assistant_message_id, assistant_written = message_sink.add_message(
+            conversation_id, "assistant", final_answer, is_truncated=truncated
         )
-        session.add(assistant_message)
-        await session.commit()
+        writes.append(assistant_written)
+
+        if not truncated and cached_answer is None and question_embedding is not None and final_answer:
+            # Runs after the last token, so it only shows in the exported trace.
+            with span("db_commit_answer"):
+                async with async_session_factory() as session:
+                    await store_answer(
+                        session,
+                        document.id if document else None,
+                        payload.question,
+                        question_embedding,
+                        final_answer,
+                    )
+                    await session.commit()
+
+        schedule_summary(conversation_id)
+
+    async def event_generator() -> AsyncGenerator[str | bytes, None]:
+        watcher = asyncio.create_task(watch_disconnect())
+        saved = False
+        try:
+            try:
+                async for chunk in answer_chunks():
+                    if disconnected.is_set():
+                        break
+                    parts.append(chunk)
+                    yield chunk if stream_format == "text" else encode_event(stream_format, "token", {"content": chunk})
+            except Exception as exc:  # noqa: BLE001
+                logger.error(f"Chat stream failed after {len(parts)} chunks: {exc}")
+                saved = True
+                await save_answer(truncated=True)
+                if stream_format == "text":
+                    raise
+                # Structured clients get a terminal event instead of a cut-off body.
+                yield encode_event(stream_format, "error", {"detail": "The language model stream failed."})
+                return
+
+            truncated = disconnected.is_set() or (ollama_stream is not None and ollama_stream.cancelled)
+            saved = True
+            await save_answer(truncated=truncated)
+            if truncated:
+                return
+
+            # End the response only once the turn is committed, so the
+            # client's next request sees it on any worker, and the ids in the
+            # done event refer to rows that exist.
+            with span("message_sink_wait"):
+                written = all(await asyncio.gather(*writes))
+            if not written:
+                logger.error(f"Messages of conversation {conversation_id} were not saved")
+                if stream_format != "text":
+                    yield encode_event(stream_format, "error", {"detail": "The answer could not be saved."})
+                return
+
+            if stream_format != "text":
+                stats = dict(ollama_stream.stats) if ollama_stream is not None else {}
+                if stats.get("eval_count") and stats.get("eval_duration"):
+                    stats["tokens_per_second"] = round(stats["eval_count"] / (stats["eval_duration"] / 1e9), 2)
+                yield encode_event(
+                    stream_format,
+                    "done",
+                    {
+                        "conversation_id": str(conversation_id),
+                        "message_id": str(assistant_message_id),
+                        "answer_cache": "hit" if cached_answer is not None else "miss",
+                        "stats": stats,
+                    },
+                )
+        finally:
+            watcher.cancel()
+            if not saved:
+                # The response was cancelled mid-stream (the server noticed the
+                # disconnect first). Stop the generation and keep what was
+                # streamed; shielded, since the surrounding scope is cancelled.
+                with anyio.CancelScope(shield=True):
+                    if ollama_stream is not None:
+                        await ollama_stream.aclose()
+                    try:
+                        await save_answer(truncated=True)
+                    except Exception as exc:  # noqa: BLE001
+                        logger.error(f"Saving the partial answer of conversation {conversation_id} failed: {exc}")
 
     return StreamingResponse(
         event_generator(),
-        media_type="text/plain",
+        media_type=STREAM_MEDIA_TYPES[stream_format],
         headers={
-            "X-Conversation-Id": str(conv.id),
+            "X-Conversation-Id": str(conversation_id),
+            "X-Answer-Cache": "hit" if cached_answer is not None else "miss",
+            **({"Cache-Control": "no-cache"} if stream_format == "sse" else {}),
         },
+        background=BackgroundTask(ollama_stream.aclose) if ollama_stream is not None else None,
     )
@@ -1,18 +1,42 @@
 import uuid
-import magic
 
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status
+import anyio
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import desc, select
 
-from app.db import get_session
-from app.models import Document
-from app.schemas import DocumentResponse
+from app.db import get_read_session, get_session
+from app.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    NEXT_CURSOR_HEADER,
+    after_cursor,
+    encode_cursor,
+)
+from app.models import Document, IngestionJob
+from app.schemas import (
+    BatchFileStatus,
+    BatchStatusResponse,
+    BatchUploadFile,
+    BatchUploadResponse,
+    DocumentResponse,
+    DocumentStatusResponse,
+)
 from app.config import get_settings
-from app.services.embedding import process_and_store_document_chunks
+from app.services.ingestion import enqueue_document, enqueue_reingest, worker_pool
+from app.services.upload_stream import (
+    ZIP_MIME_TYPE,
+    StoredUpload,
+    discard_uploads,
+    expand_archives,
+    receive_uploads,
+)
+from app.tracing import span
 
 from datetime import datetime, timezone
+from collections import Counter
 from typing import List
 from loguru import logger
 
@@ -23,6 +47,7 @@ ALLOWED_MIME_TYPES = {
     "application/pdf": "pdf",
     "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
 }
+BATCH_ALLOWED_MIME_TYPES = {**ALLOWED_MIME_TYPES, ZIP_MIME_TYPE: "zip"}
 
 UPLOAD_DIR = settings.upload_doc_dir
 
@@ -33,71 +58,361 @@ UPLOAD_DIR = settings.upload_doc_dir
     status_code=status.HTTP_200_OK,
 )
 async def list_documents(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_read_session),
+):
+    stmt = (
+        select(
+            Document.id,
+            Document.filename,
+            Document.original_filename,
+            Document.file_type,
+            Document.status,
+            Document.uploaded_at,
+            Document.meta_data,
+        )
+        .order_by(desc(Document.uploaded_at), desc(Document.id))
+        .limit(limit)
+    )
+    if cursor:
+        stmt = stmt.where(after_cursor(Document.uploaded_at, Document.id, cursor))
+
+    documents = (await db.execute(stmt)).mappings().all()
+    if len(documents) == limit:
+        last = documents[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last["uploaded_at"], last["id"])
+    return documents
+
+
+async def find_duplicate_document(db: AsyncSession, content_hash: str) -> Document | None:
+    result = await db.execute(
+        select(Document)
+        .where(
+            Document.content_hash == content_hash,
+            Document.status.in_(("queued", "processing", "ready")),
+        )
+        .order_by(desc(Document.uploaded_at))
+        .limit(1)
+    )
+    return result.scalars().first()
+
+
+@router.get(
+    "/{document_id}/status",
+    response_model=DocumentStatusResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_document_status(
+    document_id: uuid.UUID,
+    # Polled right after upload, so it reads the primary rather than a lagging replica.
     db: AsyncSession = Depends(get_session),
 ):
+    document = await db.get(Document, document_id)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found.")
+
     result = await db.execute(
-        select(Document).order_by(desc(Document.uploaded_at))
+        select(IngestionJob)
+        .where(IngestionJob.document_id == document_id)
+        .order_by(desc(IngestionJob.created_at))
+        .limit(1)
+    )
+    job = result.scalars().first()
+
+    return DocumentStatusResponse(
+        id=document.id,
+        status=document.status,
+        job_kind=job.kind if job else None,
+        job_status=job.status if job else None,
+        attempts=job.attempts if job else 0,
+        error=job.error if job else None,
+        started_at=job.started_at if job else None,
+        finished_at=job.finished_at if job else None,
+    )
+
+
+def _document_from_upload(upload: StoredUpload) -> Document:
+    return Document(
+        id=upload.id,
+        filename=str(upload.path),
+        original_filename=upload.original_filename,
+        file_type=upload.file_type,
+        content_hash=upload.sha256,
+        status="queued",
+        meta_data=None,
+        uploaded_at=datetime.now(timezone.utc),
     )
-    documents = result.scalars().all()
-    return documents
+
+
+UPLOAD_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "multipart/form-data": {
+            "schema": {
+                "type": "object",
+                "required": ["file"],
+                "properties": {"file": {"type": "string", "format": "binary"}},
+            }
+        }
+    },
+}
 
 
 @router.post(
     "/upload",
     response_model=DocumentResponse,
-    status_code=status.HTTP_201_CREATED,
+    status_code=status.HTTP_202_ACCEPTED,
+    openapi_extra={"requestBody": UPLOAD_REQUEST_BODY},
 )
-async def upload_document(file: UploadFile = File(...), db: AsyncSession = Depends(get_session)):
-    file_bytes = await file.read()
-    mime = magic.from_buffer(file_bytes, mime=True)
-    if mime not in ALLOWED_MIME_TYPES:
-        raise HTTPException(status_code=400, detail="Only PDF or DOCX files are allowed")
-    file_type = ALLOWED_MIME_TYPES[mime]
-
-    document_id = uuid.uuid4()
-    filename = f"{document_id}.{file_type}"
-    file_path = UPLOAD_DIR / filename
+async def upload_document(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_session),
+):
+    # The body is parsed here rather than through UploadFile so the file is
+    # hashed and written to disk as it arrives instead of being spooled first.
+    with span("upload_receive"):
+        [upload] = await receive_uploads(request, UPLOAD_DIR, ALLOWED_MIME_TYPES)
+    file_path = upload.path
 
     try:
-        logger.info(f"Uploading file to {file_path}...")
-        with open(file_path, "wb") as f:
-            f.write(file_bytes)
-        logger.info("File uploaded")
-
-        document = Document(
-            id=document_id,
-            filename=str(file_path),
-            original_filename=file.filename,
-            file_type=file_type,
-            status="processing",
-            meta_data=None,
-            uploaded_at=datetime.now(timezone.utc),
-        )
+        existing = await find_duplicate_document(db, upload.sha256)
+        if existing:
+            logger.info(f"Upload matches document {existing.id}, reusing its chunks")
+            await anyio.Path(file_path).unlink(missing_ok=True)
+            response.status_code = status.HTTP_200_OK
+            return existing
+
+        document = _document_from_upload(upload)
         db.add(document)
+        enqueue_document(db, document)
         await db.commit()
         await db.refresh(document)
 
-        logger.info("Embedding document...")
-        await process_and_store_document_chunks(file_bytes, str(document_id), db=db, file_type=file_type)
+        worker_pool.notify()
+        logger.info(f"Document {document.id} queued for ingestion")
+        return document
+
+    except Exception as exc:
+        logger.exception(f"Error while uploading document: {str(exc)}")
+        await db.rollback()
+        try:
+            await anyio.Path(file_path).unlink(missing_ok=True)
+        except Exception as e:
+            logger.error(f"Error deleting file: {e}")
+        raise HTTPException(status_code=500, detail=f"Document upload failed: {str(exc)}")
+
+
+@router.put(
+    "/{document_id}",
+    response_model=DocumentResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    openapi_extra={"requestBody": UPLOAD_REQUEST_BODY},
+)
+async def replace_document(
+    document_id: uuid.UUID,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_session),
+):
+    """Replace a document with a revised file, re-embedding only the chunks that changed.
+
+    The current version stays searchable until the new one is applied; follow
+    progress at /documents/{document_id}/status.
+    """
+    document = await db.get(Document, document_id)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found.")
+
+    with span("upload_receive"):
+        [upload] = await receive_uploads(request, UPLOAD_DIR, ALLOWED_MIME_TYPES)
+
+    try:
+        if upload.sha256 == document.content_hash:
+            await anyio.Path(upload.path).unlink(missing_ok=True)
+            response.status_code = status.HTTP_200_OK
+            return document
 
-        document.status = "ready"
+        active = await db.scalar(
+            select(IngestionJob.id)
+            .where(IngestionJob.document_id == document.id, IngestionJob.status.in_(("queued", "running")))
+            .limit(1)
+        )
+        if active is not None or document.status in ("queued", "processing"):
+            raise HTTPException(status_code=409, detail="Document is already being ingested.")
+
+        enqueue_reingest(
+            db,
+            document,
+            source_path=str(upload.path),
+            source_filename=upload.original_filename,
+            source_hash=upload.sha256,
+        )
         await db.commit()
-        await db.refresh(document)
-        logger.info("Document embedded successfully")
-        return document
+    except BaseException:
+        await db.rollback()
+        await anyio.Path(upload.path).unlink(missing_ok=True)
+        raise
+
+    worker_pool.notify()
+    logger.info(f"Document {document.id} queued for re-ingestion")
+    return document
+
+
+BATCH_UPLOAD_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "multipart/form-data": {
+            "schema": {
+                "type": "object",
+                "required": ["files"],
+                "properties": {
+                    "files": {
+                        "type": "array",
+                        "items": {"type": "string", "format": "binary"},
+                        "description": "PDF and DOCX files, or zip archives of them",
+                    }
+                },
+            }
+        }
+    },
+}
+
+
+@router.post(
+    "/upload/batch",
+    response_model=BatchUploadResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    openapi_extra={"requestBody": BATCH_UPLOAD_REQUEST_BODY},
+)
+async def upload_documents_batch(
+    request: Request,
+    db: AsyncSession = Depends(get_session),
+):
+    """Queue many files at once; the ingestion workers pipeline them together.
+
+    Unsupported files are reported as rejected and files already uploaded as
+    duplicates; neither fails the batch. Progress is at /documents/batches/{batch_id}.
+    """
+    max_files = settings.UPLOAD_BATCH_MAX_FILES
+    with span("upload_receive"):
+        uploads = await receive_uploads(
+            request,
+            UPLOAD_DIR,
+            BATCH_ALLOWED_MIME_TYPES,
+            field_name="files",
+            max_files=max_files,
+            skip_unsupported=True,
+        )
+        uploads = await expand_archives(uploads, UPLOAD_DIR, ALLOWED_MIME_TYPES, max_files=max_files)
+    if len(uploads) > max_files:
+        await discard_uploads(uploads)
+        raise HTTPException(status_code=400, detail=f"At most {max_files} files per batch, got {len(uploads)}")
 
+    batch_id = uuid.uuid4()
+    results: List[BatchUploadFile] = []
+    try:
+        for upload in uploads:
+            if upload.error:
+                results.append(BatchUploadFile(filename=upload.original_filename, status="rejected", error=upload.error))
+                continue
+            # Autoflush makes documents added earlier in this loop visible, so
+            # a file repeated within the batch is caught here too.
+            existing = await find_duplicate_document(db, upload.sha256)
+            if existing:
+                await anyio.Path(upload.path).unlink(missing_ok=True)
+                results.append(
+                    BatchUploadFile(filename=upload.original_filename, status="duplicate", document_id=existing.id)
+                )
+                continue
+            document = _document_from_upload(upload)
+            db.add(document)
+            enqueue_document(db, document, batch_id=batch_id)
+            results.append(BatchUploadFile(filename=upload.original_filename, status="queued", document_id=document.id))
+        await db.commit()
     except Exception as exc:
-        logger.exception(f"Error while uploading or processing document: {str(exc)}")
+        logger.exception(f"Error while uploading batch {batch_id}: {exc}")
         await db.rollback()
-        if "document" in locals():
-            try:
-                await db.delete(document)
-                await db.commit()
-            except Exception as e:
-                logger.error(f"Error deleting document from DB: {e}")
-        if file_path.exists():
-            try:
-                file_path.unlink()
-            except Exception as e:
-                logger.error(f"Error deleting file: {e}")
-        raise HTTPException(status_code=500, detail=f"Document upload or processing failed: {str(exc)}")
+        await discard_uploads(uploads)
+        raise HTTPException(status_code=500, detail=f"Batch upload failed: {exc}")
+
+    counts = Counter(result.status for result in results)
+    if counts["queued"]:
+        worker_pool.notify()
+    logger.info(
+        f"Batch {batch_id}: {counts['queued']} queued, {counts['duplicate']} duplicates, {counts['rejected']} rejected"
+    )
+    return BatchUploadResponse(
+        batch_id=batch_id,
+        queued=counts["queued"],
+        duplicates=counts["duplicate"],
+        rejected=counts["rejected"],
+        files=results,
+    )
+
+
+@router.get(
+    "/batches/{batch_id}",
+    response_model=BatchStatusResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_batch_status(
+    batch_id: uuid.UUID,
+    # Polled while the batch runs, so it reads the primary like the status endpoint.
+    db: AsyncSession = Depends(get_session),
+):
+    rows = (
+        await db.execute(
+            select(IngestionJob, Document.original_filename, Document.status)
+            .join(Document, Document.id == IngestionJob.document_id)
+            .where(IngestionJob.batch_id == batch_id)
+            .order_by(IngestionJob.created_at, IngestionJob.id)
+        )
+    ).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Batch not found.")
+
+    files = [
+        BatchFileStatus(
+            document_id=job.document_id,
+            filename=filename,
+            status=document_status,
+            attempts=job.attempts,
+            error=job.error,
+            page_count=job.page_count,
+            chunk_count=job.chunk_count,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+        )
+        for job, filename, document_status in rows
+    ]
+    pages = sum(file.page_count or 0 for file in files)
+    chunks = sum(file.chunk_count or 0 for file in files)
+    started = [file.started_at for file in files if file.started_at]
+    started_at = min(started) if started else None
+    finished_at = None
+    if all(file.status in ("ready", "failed") for file in files):
+        finished_at = max((file.finished_at for file in files if file.finished_at), default=None)
+
+    elapsed = pages_per_sec = chunks_per_sec = None
+    if started_at is not None:
+        elapsed = ((finished_at or datetime.now(timezone.utc)) - started_at).total_seconds()
+        if elapsed > 0:
+            pages_per_sec = round(pages / elapsed, 2)
+            chunks_per_sec = round(chunks / elapsed, 2)
+
+    return BatchStatusResponse(
+        batch_id=batch_id,
+        total=len(files),
+        counts=dict(Counter(file.status for file in files)),
+        pages=pages,
+        chunks=chunks,
+        started_at=started_at,
+        finished_at=finished_at,
+        elapsed_seconds=round(elapsed, 3) if elapsed is not None else None,
+        pages_per_sec=pages_per_sec,
+        chunks_per_sec=chunks_per_sec,
+        files=files,
+    )
@@ -1,12 +1,15 @@
 from pydantic import BaseModel, Field
 from uuid import UUID
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Literal
 
 class MessageCreate(BaseModel):
     document_filename: str | None = None
     conversation_id: UUID | None = None
     question: str = Field(..., min_length=1)
+    lexical_weight: float | None = Field(None, ge=0.0, le=1.0)
+    # text: the raw answer; ndjson / sse: token events, then a done event with stats.
+    format: Literal["text", "ndjson", "sse"] = "text"
 
 
 class DocumentResponse(BaseModel):
@@ -19,6 +22,58 @@ class DocumentResponse(BaseModel):
     meta_data: str | None = None
 
 
+class DocumentStatusResponse(BaseModel):
+    id: UUID
+    status: str
+    job_kind: str | None = None  # ingest | reingest
+    job_status: str | None = None
+    attempts: int = 0
+    error: str | None = None
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+
+class BatchUploadFile(BaseModel):
+    filename: str | None = None
+    status: str  # queued | duplicate | rejected
+    document_id: UUID | None = None
+    error: str | None = None
+
+
+class BatchUploadResponse(BaseModel):
+    batch_id: UUID
+    queued: int
+    duplicates: int
+    rejected: int
+    files: List[BatchUploadFile]
+
+
+class BatchFileStatus(BaseModel):
+    document_id: UUID
+    filename: str | None = None
+    status: str
+    attempts: int = 0
+    error: str | None = None
+    page_count: int | None = None
+    chunk_count: int | None = None
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+
+class BatchStatusResponse(BaseModel):
+    batch_id: UUID
+    total: int
+    counts: Dict[str, int]
+    pages: int
+    chunks: int
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    elapsed_seconds: float | None = None
+    pages_per_sec: float | None = None
+    chunks_per_sec: float | None = None
+    files: List[BatchFileStatus]
+
+
 class ConversationListSchema(BaseModel):
     id: UUID
     document_id: UUID | None = None
@@ -29,6 +84,7 @@ class MessageSchema(BaseModel):
     id: UUID
     role: str
     content: str
+    is_truncated: bool = False
     created_at: datetime
 
     class Config:
@@ -0,0 +1,100 @@
+from __future__ import annotations
+from datetime import datetime, timedelta, timezone
+from typing import AsyncGenerator, List
+from uuid import UUID
+
+from loguru import logger
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models import AnswerCacheEntry
+from app.tracing import traced
+
+settings = get_settings()
+
+REPLAY_CHUNK_CHARS = 64
+
+_stores_since_eviction = 0
+
+
+@traced("answer_cache")
+async def lookup_answer(
+    db: AsyncSession,
+    document_id: UUID | None,
+    question_embedding: List[float],
+) -> AnswerCacheEntry | None:
+    """Closest cached answer for the same document and model above the similarity threshold."""
+    now = datetime.now(timezone.utc)
+    distance = AnswerCacheEntry.question_embedding.cosine_distance(question_embedding).label("distance")
+    scope = (
+        AnswerCacheEntry.document_id == document_id
+        if document_id is not None
+        else AnswerCacheEntry.document_id.is_(None)
+    )
+    result = await db.execute(
+        select(AnswerCacheEntry, distance)
+        .where(
+            scope,
+            AnswerCacheEntry.model == settings.OLLAMA_MODEL_NAME,
+            AnswerCacheEntry.created_at > now - timedelta(seconds=settings.ANSWER_CACHE_TTL_SECONDS),
+        )
+        .order_by(distance)
+        .limit(1)
+    )
+    row = result.first()
+    if row is None or row.distance > 1 - settings.ANSWER_CACHE_SIMILARITY_THRESHOLD:
+        return None
+
+    entry = row.AnswerCacheEntry
+    entry.hit_count += 1
+    entry.last_used_at = now
+    logger.info(f"Answer cache hit {entry.id} (distance={row.distance:.4f})")
+    return entry
+
+
+@traced("answer_cache_store")
+async def store_answer(
+    db: AsyncSession,
+    document_id: UUID | None,
+    question: str,
+    question_embedding: List[float],
+    answer: str,
+) -> None:
+    global _stores_since_eviction
+    db.add(
+        AnswerCacheEntry(
+            document_id=document_id,
+            model=settings.OLLAMA_MODEL_NAME,
+            question=question,
+            question_embedding=question_embedding,
+            answer=answer,
+            hit_count=0,
+        )
+    )
+
+    _stores_since_eviction += 1
+    if _stores_since_eviction >= settings.ANSWER_CACHE_EVICT_EVERY:
+        _stores_since_eviction = 0
+        await evict_answers(db)
+
+
+async def evict_answers(db: AsyncSession) -> None:
+    expired_before = datetime.now(timezone.utc) - timedelta(seconds=settings.ANSWER_CACHE_TTL_SECONDS)
+    await db.execute(delete(AnswerCacheEntry).where(AnswerCacheEntry.created_at < expired_before))
+
+    overflow = (
+        select(AnswerCacheEntry.id)
+        .order_by(AnswerCacheEntry.last_used_at.desc())
+        .offset(settings.ANSWER_CACHE_MAX_ENTRIES)
+    )
+    await db.execute(delete(AnswerCacheEntry).where(AnswerCacheEntry.id.in_(overflow)))
+
+
+async def invalidate_document(db: AsyncSession, document_id: UUID) -> None:
+    await db.execute(delete(AnswerCacheEntry).where(AnswerCacheEntry.document_id == document_id))
+
+
+async def replay_answer(answer: str) -> AsyncGenerator[str, None]:
+    for start in range(0, len(answer), REPLAY_CHUNK_CHARS):
+        yield answer[start:start + REPLAY_CHUNK_CHARS]
@@ -0,0 +1,71 @@
+from __future__ import annotations
+import struct
+import uuid
+from typing import Iterable, List, Sequence, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.embedding_cache import content_hash
+
+CHUNK_COLUMNS = (
+    "id",
+    "document_id",
+    "chunk_index",
+    "content",
+    "content_hash",
+    "embedding",
+    "page_number",
+    "section",
+)
+
+ChunkRecord = Tuple[uuid.UUID, uuid.UUID, int, str, str, Sequence[float], int | None, str | None]
+
+
+def encode_vector(vec: Sequence[float]) -> bytes:
+    # pgvector binary format: uint16 dim, uint16 unused, dim x float4 (big-endian)
+    return struct.pack(f">HH{len(vec)}f", len(vec), 0, *vec)
+
+
+def decode_vector(data: bytes) -> List[float]:
+    dim, _ = struct.unpack_from(">HH", data)
+    return list(struct.unpack_from(f">{dim}f", data, 4))
+
+
+def build_chunk_records(
+    document_id: str | uuid.UUID,
+    chunks: Iterable[Tuple[int, str, int, str]],
+    embeddings: Iterable[Sequence[float]],
+) -> List[ChunkRecord]:
+    document_uuid = uuid.UUID(str(document_id))
+    return [
+        (uuid.uuid4(), document_uuid, idx, content, content_hash(content), emb, page_number, section)
+        for (idx, content, page_number, section), emb in zip(chunks, embeddings)
+    ]
+
+
+async def copy_chunks(db: AsyncSession, records: List[ChunkRecord]) -> None:
+    """COPY chunk rows into document_chunks on the session's connection and transaction."""
+    if not records:
+        return
+
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    driver = raw_connection.driver_connection
+
+    # The binary codec is only installed for the COPY; SQLAlchemy's pgvector
+    # type binds vectors as text on the same pooled connection.
+    await driver.set_type_codec(
+        "vector",
+        schema="public",
+        encoder=encode_vector,
+        decoder=decode_vector,
+        format="binary",
+    )
+    try:
+        await driver.copy_records_to_table(
+            "document_chunks",
+            records=records,
+            columns=CHUNK_COLUMNS,
+        )
+    finally:
+        await driver.reset_type_codec("vector", schema="public")
@@ -0,0 +1,312 @@
+from __future__ import annotations
+import re
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Tuple
+
+from app.config import get_settings
+
+settings = get_settings()
+
+# (chunk_index, content, page_number, section)
+Chunk = Tuple[int, str, int, str]
+LengthFn = Callable[[str], int]
+
+PARAGRAPH_SEP = "\n\n"
+SENTENCE_SEP = " "
+
+# CLS and SEP are added by the model on top of the chunk's own tokens.
+SPECIAL_TOKENS = 2
+
+_SENTENCE_BOUNDARY_RE = re.compile(r"[.!?][\"')\]]*(\s+)(?=[\"'(\[]?[A-Z0-9À-Ý])")
+_ABBREVIATIONS = frozenset(
+    {"art.", "cf.", "co.", "corp.", "dr.", "e.g.", "etc.", "i.e.", "inc.", "ltd.", "mr.", "mrs.", "ms.",
+     "no.", "nos.", "p.", "para.", "pp.", "sec.", "st.", "vs."}
+)
+_CLAUSE_HEADING_RE = re.compile(
+    r"^(?:(?:article|section|clause|schedule|annex|appendix|exhibit)\s+[\dIVXLC]+\b|§\s*\d+|\d+[.)]?\s+\S)",
+    re.IGNORECASE,
+)
+
+
+def split_sentences(text: str) -> List[str]:
+    sentences: List[str] = []
+    start = 0
+    for match in _SENTENCE_BOUNDARY_RE.finditer(text):
+        candidate = text[start:match.start(1)]
+        words = candidate.split()
+        if not words:
+            continue
+        last = words[-1].lower()
+        # "No. 5", "e.g. Clause 3" and initials like "J. Smith" are not boundaries.
+        if last in _ABBREVIATIONS or (len(last) == 2 and last[0].isalpha() and last[1] == "."):
+            continue
+        sentences.append(candidate.strip())
+        start = match.end()
+    tail = text[start:].strip()
+    if tail:
+        sentences.append(tail)
+    return sentences
+
+
+class TokenCounter:
+    """Token lengths measured with the embedding model's own tokenizer."""
+
+    def __init__(self, tokenizer) -> None:
+        self._tokenizer = tokenizer
+
+    def __call__(self, text: str) -> int:
+        return len(self._tokenizer(text, add_special_tokens=False, verbose=False)["input_ids"])
+
+    def windows(self, text: str, size: int, overlap: int) -> List[Tuple[str, int]]:
+        """Cut text into windows of at most size tokens on token boundaries."""
+        offsets = self._tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+        )["offset_mapping"]
+        step = max(size - overlap, 1)
+        pieces = []
+        for first in range(0, len(offsets), step):
+            last = min(first + size, len(offsets))
+            pieces.append((text[offsets[first][0]:offsets[last - 1][1]], last - first))
+            if last == len(offsets):
+                break
+        return pieces
+
+
+class Chunker(ABC):
+    """Packs units of text into chunks of at most max_length.
+
+    Subclasses decide what a unit is (a paragraph or a sentence), how length
+    is measured and how a unit longer than max_length is split. The buffer is
+    a list of parts joined once per chunk, so packing is linear in the input.
+    Paragraphs are fed one at a time so chunking can run while later pages
+    are still being extracted.
+    """
+
+    # Whether the tail of a chunk is repeated at the start of the next one.
+    carry_overlap = True
+
+    def __init__(self, max_length: int, overlap_length: int, length: LengthFn) -> None:
+        if overlap_length >= max_length:
+            raise ValueError("Chunk overlap must be smaller than the chunk size")
+        self.max_length = max_length
+        self.overlap_length = overlap_length
+        self.length = length
+        self.idx = 0
+        self.current_section = ""
+
+        self._texts: List[str] = []
+        self._lengths: List[int] = []
+        self._seps: List[str] = []
+        self._pages: List[int] = []
+        self._sections: List[str] = []
+        self._size = 0
+        self._fresh = 0  # units not carried over from the previous chunk
+        self._sep_lengths: Dict[str, int] = {}
+
+    def is_heading(self, para: str) -> bool:
+        return para.isupper() and len(para.split()) < 10
+
+    def units(self, para: str) -> List[Tuple[str, str]]:
+        """(separator, text) pairs the paragraph is packed as."""
+        return [(PARAGRAPH_SEP, para)]
+
+    @abstractmethod
+    def split_oversized(self, text: str) -> List[Tuple[str, int]]:
+        """Cut a unit longer than max_length into (piece, length) pairs that fit."""
+
+    def add(self, page_number: int, para: str) -> List[Chunk]:
+        chunks: List[Chunk] = []
+        if self.is_heading(para):
+            self.current_section = para
+        for sep, text in self.units(para):
+            self._push(text, self.length(text), sep, page_number, chunks)
+        return chunks
+
+    def flush(self) -> List[Chunk]:
+        chunks: List[Chunk] = []
+        if self._fresh:
+            self._emit(chunks, carry=False)
+        self._reset()
+        return chunks
+
+    def _sep_length(self, sep: str) -> int:
+        if sep not in self._sep_lengths:
+            self._sep_lengths[sep] = self.length(sep)
+        return self._sep_lengths[sep]
+
+    def _push(self, text: str, length: int, sep: str, page_number: int, chunks: List[Chunk]) -> None:
+        if length > self.max_length:
+            for n, (piece, piece_length) in enumerate(self.split_oversized(text)):
+                self._push(piece, piece_length, sep if n == 0 else SENTENCE_SEP, page_number, chunks)
+            return
+
+        cost = length + (self._sep_length(sep) if self._texts else 0)
+        if self._fresh and self._size + cost > self.max_length:
+            self._emit(chunks, carry=self.carry_overlap)
+        # Carried-over overlap gives way to new text rather than forcing a
+        # chunk that would only repeat the previous one.
+        while self._texts and self._size + length + self._sep_length(sep) > self.max_length:
+            self._drop_first()
+
+        if self._texts:
+            self._size += self._sep_length(sep)
+        self._texts.append(text)
+        self._lengths.append(length)
+        self._seps.append(sep)
+        self._pages.append(page_number)
+        self._sections.append(self.current_section)
+        self._size += length
+        self._fresh += 1
+
+    def _drop_first(self) -> None:
+        self._size -= self._lengths.pop(0)
+        self._texts.pop(0)
+        self._seps.pop(0)
+        self._pages.pop(0)
+        self._sections.pop(0)
+        if self._texts:
+            self._size -= self._sep_length(self._seps[0])
+
+    def _emit(self, chunks: List[Chunk], carry: bool) -> None:
+        parts = [self._texts[0]]
+        for sep, text in zip(self._seps[1:], self._texts[1:]):
+            parts.append(sep)
+            parts.append(text)
+        chunks.append((self.idx, "".join(parts), self._pages[0], self._sections[0]))
+        self.idx += 1
+
+        keep = 0
+        if carry:
+            size = 0
+            # Never carry the whole buffer, only a tail of it.
+            for length in reversed(self._lengths[1:]):
+                size += length
+                if size > self.overlap_length:
+                    break
+                keep += 1
+        if keep:
+            del self._texts[:-keep], self._lengths[:-keep], self._seps[:-keep]
+            del self._pages[:-keep], self._sections[:-keep]
+            self._size = sum(self._lengths) + sum(self._sep_length(sep) for sep in self._seps[1:])
+            self._fresh = 0
+        else:
+            self._reset()
+
+    def _reset(self) -> None:
+        self._texts.clear()
+        self._lengths.clear()
+        self._seps.clear()
+        self._pages.clear()
+        self._sections.clear()
+        self._size = 0
+        self._fresh = 0
+
+
+class ParagraphChunker(Chunker):
+    """Character-sized paragraph packing; long paragraphs are cut at fixed offsets."""
+
+    carry_overlap = False
+
+    def __init__(self, *, max_chars: int = 1200, overlap_chars: int = 200) -> None:
+        super().__init__(max_chars, overlap_chars, len)
+
+    def split_oversized(self, text: str) -> List[Tuple[str, int]]:
+        pieces = []
+        start = 0
+        while start < len(text):
+            end = min(start + self.max_length, len(text))
+            pieces.append((text[start:end], end - start))
+            if end == len(text):
+                break
+            start = end - self.overlap_length
+        return pieces
+
+
+class TokenChunker(Chunker):
+    """Paragraph packing sized in embedding-model tokens.
+
+    A paragraph over the budget is split at sentence boundaries, and a single
+    sentence over the budget at token boundaries, so no chunk is truncated by
+    the model.
+    """
+
+    def __init__(self, counter: TokenCounter, *, max_tokens: int, overlap_tokens: int) -> None:
+        super().__init__(max_tokens, overlap_tokens, counter)
+        self.counter = counter
+
+    def split_oversized(self, text: str) -> List[Tuple[str, int]]:
+        pieces = []
+        for sentence in split_sentences(text):
+            length = self.counter(sentence)
+            if length <= self.max_length:
+                pieces.append((sentence, length))
+            else:
+                pieces.extend(self.counter.windows(sentence, self.max_length, self.overlap_length))
+        return pieces
+
+
+class SentenceChunker(TokenChunker):
+    """Packs sentences rather than paragraphs, so chunks end on sentence boundaries."""
+
+    def units(self, para: str) -> List[Tuple[str, str]]:
+        sentences = split_sentences(para)
+        return [(PARAGRAPH_SEP if n == 0 else SENTENCE_SEP, s) for n, s in enumerate(sentences)]
+
+
+class ClauseChunker(TokenChunker):
+    """Starts a new chunk at every heading and top-level clause.
+
+    Contract questions are usually about one clause, so a chunk should not mix
+    the end of one clause with the start of the next. Sub-clauses (2.1, 2.2)
+    are still packed together while they fit.
+    """
+
+    carry_overlap = False
+
+    def is_heading(self, para: str) -> bool:
+        if super().is_heading(para):
+            return True
+        return len(para.split()) < 12 and bool(_CLAUSE_HEADING_RE.match(para)) and not para.endswith(".")
+
+    def add(self, page_number: int, para: str) -> List[Chunk]:
+        chunks: List[Chunk] = []
+        if self.is_heading(para) or _CLAUSE_HEADING_RE.match(para):
+            chunks.extend(self._close_clause())
+        chunks.extend(super().add(page_number, para))
+        return chunks
+
+    def _close_clause(self) -> List[Chunk]:
+        # A lone heading stays attached to the clause it introduces.
+        if self._fresh and not all(self.is_heading(text) for text in self._texts):
+            chunks: List[Chunk] = []
+            self._emit(chunks, carry=False)
+            return chunks
+        return []
+
+
+def get_chunker(strategy: str | None = None) -> Chunker:
+    strategy = strategy or settings.CHUNKING_STRATEGY
+    if strategy == "paragraph":
+        return ParagraphChunker(max_chars=settings.CHUNK_MAX_CHARS, overlap_chars=settings.CHUNK_OVERLAP_CHARS)
+
+    from app.services.model_registry import model_registry
+
+    counter = TokenCounter(model_registry.tokenizer)
+    max_tokens = settings.CHUNK_MAX_TOKENS or model_registry.max_seq_length - SPECIAL_TOKENS
+    kwargs = {"max_tokens": max_tokens, "overlap_tokens": min(settings.CHUNK_OVERLAP_TOKENS, max_tokens // 2)}
+    if strategy == "token":
+        return TokenChunker(counter, **kwargs)
+    if strategy == "sentence":
+        return SentenceChunker(counter, **kwargs)
+    if strategy == "clause":
+        return ClauseChunker(counter, **kwargs)
+    raise ValueError(f"Unsupported CHUNKING_STRATEGY: {strategy}")
+
+
+def chunk_paragraphs(paragraphs: List[Tuple[int, str]], chunker: Chunker | None = None) -> List[Chunk]:
+    chunker = chunker or get_chunker()
+    chunks: List[Chunk] = []
+    for page_number, para in paragraphs:
+        chunks.extend(chunker.add(page_number, para))
+    chunks.extend(chunker.flush())
+    return chunks
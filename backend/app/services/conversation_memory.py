@@ -0,0 +1,180 @@
+from __future__ import annotations
+import asyncio
+import os
+from functools import lru_cache
+from typing import Dict, List, Set
+from uuid import UUID
+
+from fastapi import HTTPException
+from loguru import logger
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.db import async_session_factory
+from app.models import Conversation, Message
+from app.services.message_sink import message_sink
+from app.services.ollama_client import complete
+from app.tracing import current_request_id, trace, traced
+
+settings = get_settings()
+
+# Chat-template overhead per message (role markers and separators).
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_summarizing: Set[UUID] = set()
+_tasks: Set[asyncio.Task] = set()
+
+
+@lru_cache(maxsize=1)
+def get_chat_tokenizer():
+    """The chat model's tokenizer, or None (with a warning, once) if it is not available."""
+    path = settings.CHAT_TOKENIZER_PATH
+    if not path or not os.path.isfile(path):
+        logger.warning(
+            f"Chat tokenizer {'not configured' if not path else f'not found at {path}'}; "
+            "history is budgeted with a len(text)/3 estimate and can exceed the model's context. "
+            "Set CHAT_TOKENIZER_PATH to the chat model's tokenizer.json."
+        )
+        return None
+    from tokenizers import Tokenizer
+
+    logger.info(f"Loading chat tokenizer: {path}")
+    return Tokenizer.from_file(path)
+
+
+def count_tokens(text: str) -> int:
+    tokenizer = get_chat_tokenizer()
+    if tokenizer is None:
+        # Rough fallback when the chat model's tokenizer is not configured.
+        return max(1, len(text) // 3)
+    return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+@traced("history")
+async def build_history(db: AsyncSession, conversation: Conversation) -> List[Dict[str, str]]:
+    """Rolling summary plus as many recent turns as fit CHAT_HISTORY_TOKEN_BUDGET."""
+    stmt = (
+        select(Message.role, Message.content)
+        .where(Message.conversation_id == conversation.id)
+        .order_by(Message.created_at.desc())
+        .limit(settings.CHAT_HISTORY_MAX_MESSAGES)
+    )
+    if conversation.summarized_until is not None:
+        stmt = stmt.where(Message.created_at > conversation.summarized_until)
+    rows = (await db.execute(stmt)).all()
+
+    budget = settings.CHAT_HISTORY_TOKEN_BUDGET
+    history: List[Dict[str, str]] = []
+
+    summary_message = None
+    if conversation.summary:
+        summary_message = {
+            "role": "system",
+            "content": f"Summary of the earlier conversation:\n{conversation.summary}",
+        }
+        budget -= count_tokens(summary_message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+    # Newest first; turns that no longer fit are covered by the next summary.
+    for row in rows:
+        cost = count_tokens(row.content) + MESSAGE_OVERHEAD_TOKENS
+        if cost > budget:
+            break
+        history.append({"role": row.role, "content": row.content})
+        budget -= cost
+
+    history.reverse()
+    if summary_message:
+        history.insert(0, summary_message)
+    return history
+
+
+def _transcript(messages: List[Message]) -> str:
+    return "\n".join(f"{m.role}: {m.content}" for m in messages)
+
+
+async def summarize_conversation(conversation_id: UUID) -> None:
+    # The turn that scheduled this may still be queued for writing.
+    await message_sink.sync(conversation_id)
+    # Read, then let go of the connection: the generation below can take a
+    # while and must not hold a pooled connection idle in transaction.
+    async with async_session_factory() as db:
+        conversation = await db.get(Conversation, conversation_id)
+        if conversation is None:
+            return
+        previous_until = conversation.summarized_until
+        previous = conversation.summary or "(none)"
+
+        stmt = (
+            select(Message)
+            .where(Message.conversation_id == conversation_id)
+            .order_by(Message.created_at)
+        )
+        if previous_until is not None:
+            stmt = stmt.where(Message.created_at > previous_until)
+        messages = list((await db.execute(stmt)).scalars())
+
+    to_fold = messages[:-settings.CHAT_SUMMARY_KEEP_RECENT] if settings.CHAT_SUMMARY_KEEP_RECENT else messages
+    if len(to_fold) < settings.CHAT_SUMMARY_MIN_MESSAGES:
+        return
+
+    summary = await complete(
+        [
+            {
+                "role": "system",
+                "content": (
+                    "You maintain a running summary of a conversation about a contract. "
+                    "Keep names, defined terms, clause numbers, figures and open questions. "
+                    "Answer with the updated summary only, in the conversation's language."
+                ),
+            },
+            {
+                "role": "user",
+                "content": f"Current summary:\n{previous}\n\nNew messages:\n{_transcript(to_fold)}",
+            },
+        ],
+        num_predict=settings.CHAT_SUMMARY_MAX_TOKENS,
+    )
+    if not summary.strip():
+        return
+
+    async with async_session_factory() as db:
+        # Only apply the fold on top of the summary it was built from; another
+        # process may have folded this conversation in the meantime.
+        result = await db.execute(
+            update(Conversation)
+            .where(
+                Conversation.id == conversation_id,
+                Conversation.summarized_until.is_not_distinct_from(previous_until),
+            )
+            .values(summary=summary.strip(), summarized_until=to_fold[-1].created_at)
+        )
+        await db.commit()
+    if result.rowcount == 0:
+        logger.info(f"Discarded summary of conversation {conversation_id}: it was folded concurrently")
+        return
+    logger.info(f"Folded {len(to_fold)} messages into the summary of conversation {conversation_id}")
+
+
+async def _run_summary(conversation_id: UUID, request_id: str | None) -> None:
+    try:
+        # Its own trace: the request that scheduled it has already been exported.
+        with trace("conversation_summary", request_id=request_id, conversation_id=str(conversation_id)):
+            await summarize_conversation(conversation_id)
+    except HTTPException:
+        # The model is busy; the next turn schedules the fold again.
+        logger.info(f"Skipped summarizing conversation {conversation_id}: model busy")
+    except Exception as exc:  # noqa: BLE001
+        logger.error(f"Summarizing conversation {conversation_id} failed: {exc}")
+    finally:
+        _summarizing.discard(conversation_id)
+
+
+def schedule_summary(conversation_id: UUID) -> None:
+    """Fold older turns into the rolling summary off the request path."""
+    if conversation_id in _summarizing:
+        return
+    _summarizing.add(conversation_id)
+    task = asyncio.create_task(_run_summary(conversation_id, current_request_id()))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
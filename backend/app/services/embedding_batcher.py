@@ -0,0 +1,142 @@
+from __future__ import annotations
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+from loguru import logger
+
+from app.metrics import EMBEDDING_BATCH_SECONDS, EMBEDDING_BATCH_SIZE, EMBEDDING_QUEUE_DEPTH
+
+EncodeFn = Callable[[List[str]], List[List[float]]]
+
+
+class EmbeddingBatcher:
+    """Coalesces embed requests from concurrent callers into shared model batches.
+
+    A batch is dispatched once it holds max_batch_size texts or the oldest
+    request has waited max_wait_ms. Batches run one at a time on a single
+    dedicated thread, and each caller gets back only its own slice.
+    """
+
+    def __init__(self, encode: EncodeFn, max_batch_size: int, max_wait_ms: float) -> None:
+        self._encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: asyncio.Queue[Tuple[List[str], asyncio.Future]] | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._task: asyncio.Task | None = None
+        self._queued_texts = 0
+        # Requests taken off the queue for the batch being collected or encoded.
+        self._batch: List[Tuple[List[str], asyncio.Future]] = []
+
+        self.batches_total = 0
+        self.texts_total = 0
+        self.last_batch_size = 0
+        self.max_batch_size_seen = 0
+        self.max_queue_depth = 0
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        self._task = asyncio.create_task(self._run(), name="embedding-batcher")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        # Callers still waiting would otherwise hang through shutdown.
+        pending = self._batch
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Embedding batcher stopped"))
+        self._batch = []
+        self._queued_texts = 0
+        EMBEDDING_QUEUE_DEPTH.set(0)
+        self._executor.shutdown(wait=False)
+        self._task = None
+        self._executor = None
+        self._queue = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queued_texts
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches_total": self.batches_total,
+            "texts_total": self.texts_total,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size_seen": self.max_batch_size_seen,
+            "avg_batch_size": round(self.texts_total / self.batches_total, 2) if self.batches_total else 0.0,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queued_texts += len(texts)
+        self.max_queue_depth = max(self.max_queue_depth, self._queued_texts)
+        EMBEDDING_QUEUE_DEPTH.set(self._queued_texts)
+        self._queue.put_nowait((texts, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[List[str], asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = self._batch = [await self._queue.get()]
+        size = len(batch[0][0])
+        deadline = loop.time() + self.max_wait
+
+        while size < self.max_batch_size:
+            if self._queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self._queue.get_nowait()
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            self._queued_texts -= len(texts)
+            EMBEDDING_QUEUE_DEPTH.set(self._queued_texts)
+            EMBEDDING_BATCH_SIZE.observe(len(texts))
+
+            self.batches_total += 1
+            self.texts_total += len(texts)
+            self.last_batch_size = len(texts)
+            self.max_batch_size_seen = max(self.max_batch_size_seen, len(texts))
+
+            started = time.perf_counter()
+            try:
+                vectors = await loop.run_in_executor(self._executor, self._encode, texts)
+                EMBEDDING_BATCH_SECONDS.observe(time.perf_counter() - started)
+            except Exception as exc:  # noqa: BLE001
+                logger.error(f"Embedding batch of {len(texts)} texts failed: {exc}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+
+            offset = 0
+            for request_texts, future in batch:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(request_texts)])
+                offset += len(request_texts)
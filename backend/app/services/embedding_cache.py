@@ -0,0 +1,88 @@
+from __future__ import annotations
+import hashlib
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models import EmbeddingCacheEntry
+
+settings = get_settings()
+
+EmbedFn = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def embedding_model_key() -> str:
+    key = f"{Path(settings.EMBEDDING_MODEL_PATH).name}:{settings.EMBEDDING_BACKEND}"
+    if settings.EMBEDDING_BACKEND == "onnx" and settings.EMBEDDING_ONNX_FILE:
+        key += f":{settings.EMBEDDING_ONNX_FILE}"
+    return key
+
+
+class EmbeddingCache:
+    """content-hash -> embedding cache: in-memory LRU in front of the embedding_cache table."""
+
+    def __init__(self, embed: EmbedFn, max_entries: int) -> None:
+        self._embed = embed
+        self.max_entries = max_entries
+        # float32 arrays keep the LRU at ~1.5KB per 384-dim entry
+        self._lru: OrderedDict[str, array] = OrderedDict()
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, vector) -> None:
+        self._lru[key] = array("f", vector)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    async def embed(self, db: AsyncSession, texts: List[str]) -> List[List[float]]:
+        model = embedding_model_key()
+        hashes = [content_hash(text) for text in texts]
+        found: Dict[str, List[float]] = {}
+
+        for key in dict.fromkeys(hashes):
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                found[key] = list(vector)
+        self.hits += len(found)
+
+        missing = [key for key in dict.fromkeys(hashes) if key not in found]
+        if missing:
+            result = await db.execute(
+                select(EmbeddingCacheEntry.content_hash, EmbeddingCacheEntry.embedding).where(
+                    EmbeddingCacheEntry.model == model,
+                    EmbeddingCacheEntry.content_hash.in_(missing),
+                )
+            )
+            for key, vector in result:
+                vector = [float(v) for v in vector]
+                found[key] = vector
+                self._remember(key, vector)
+                self.db_hits += 1
+
+        to_embed = {key: text for key, text in zip(hashes, texts) if key not in found}
+        if to_embed:
+            self.misses += len(to_embed)
+            vectors = await self._embed(list(to_embed.values()))
+            rows = []
+            for key, vector in zip(to_embed, vectors):
+                found[key] = vector
+                self._remember(key, vector)
+                rows.append({"content_hash": key, "model": model, "embedding": vector})
+            await db.execute(insert(EmbeddingCacheEntry).values(rows).on_conflict_do_nothing())
+
+        logger.debug(f"Embedding cache: {len(texts)} texts, {len(to_embed)} encoded")
+        return [found[key] for key in hashes]
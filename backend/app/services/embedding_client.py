@@ -0,0 +1,144 @@
+from __future__ import annotations
+import asyncio
+import itertools
+import json
+import struct
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from loguru import logger
+
+# Frame: header length and payload length (big-endian uint32), a JSON header,
+# then the payload. Embedding responses carry count x dim float32 values in
+# native byte order, which is fine for a socket that never leaves the host.
+FRAME_PREFIX = struct.Struct(">II")
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+
+class EmbeddingWorkerError(RuntimeError):
+    pass
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[Dict[str, Any], bytes]:
+    header_len, payload_len = FRAME_PREFIX.unpack(await reader.readexactly(FRAME_PREFIX.size))
+    if header_len + payload_len > MAX_FRAME_BYTES:
+        raise EmbeddingWorkerError(f"Frame of {header_len + payload_len} bytes exceeds {MAX_FRAME_BYTES}")
+    header = json.loads(await reader.readexactly(header_len))
+    payload = await reader.readexactly(payload_len) if payload_len else b""
+    return header, payload
+
+
+def write_frame(writer: asyncio.StreamWriter, header: Dict[str, Any], payload: bytes = b"") -> None:
+    encoded = json.dumps(header, separators=(",", ":")).encode()
+    writer.write(FRAME_PREFIX.pack(len(encoded), len(payload)) + encoded + payload)
+
+
+def pack_vectors(vectors: List[List[float]]) -> Tuple[int, bytes]:
+    dim = len(vectors[0]) if vectors else 0
+    return dim, array("f", itertools.chain.from_iterable(vectors)).tobytes()
+
+
+def unpack_vectors(payload: bytes, count: int, dim: int) -> List[List[float]]:
+    values = array("f")
+    values.frombytes(payload)
+    if len(values) != count * dim:
+        raise EmbeddingWorkerError(f"Expected {count}x{dim} floats, got {len(values)}")
+    return [values[i * dim:(i + 1) * dim].tolist() for i in range(count)]
+
+
+class EmbeddingWorkerClient:
+    """Embeds through app.embedding_worker over its Unix socket.
+
+    Drop-in for EmbeddingBatcher in API processes. One connection per process
+    is multiplexed by request id, so concurrent callers keep their requests in
+    flight together and the worker's batcher coalesces them (across API
+    processes too). A dropped connection fails the requests on it and is
+    reopened by the next call.
+    """
+
+    def __init__(self, socket_path: str | Path, timeout: float) -> None:
+        self.socket_path = str(socket_path)
+        self.timeout = timeout
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task | None = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._connect_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+
+        self.requests_total = 0
+        self.texts_total = 0
+
+    def start(self) -> None:
+        # Connects lazily, so the API can start before the worker is listening.
+        pass
+
+    async def stop(self) -> None:
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+            self._reader_task = None
+        self._close(EmbeddingWorkerError("Embedding client stopped"))
+
+    def _close(self, exc: BaseException) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(exc)
+
+    async def _connection(self) -> asyncio.StreamWriter:
+        async with self._connect_lock:
+            if self._writer is None or self._writer.is_closing():
+                reader, writer = await asyncio.open_unix_connection(self.socket_path)
+                self._writer = writer
+                self._reader_task = asyncio.create_task(self._read_responses(reader, writer), name="embedding-client")
+                logger.info(f"Connected to embedding worker at {self.socket_path}")
+            return self._writer
+
+    async def _read_responses(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                header, payload = await read_frame(reader)
+                future = self._pending.pop(header.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result((header, payload))
+        except (asyncio.IncompleteReadError, ConnectionError, EmbeddingWorkerError, ValueError) as exc:
+            logger.warning(f"Embedding worker connection lost: {exc!r}")
+            if self._writer is writer:
+                self._close(EmbeddingWorkerError("Embedding worker connection lost"))
+
+    async def _request(self, header: Dict[str, Any]) -> Tuple[Dict[str, Any], bytes]:
+        writer = await self._connection()
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            async with self._write_lock:
+                write_frame(writer, {"id": request_id, **header})
+                await writer.drain()
+            response, payload = await asyncio.wait_for(future, timeout=self.timeout)
+        finally:
+            self._pending.pop(request_id, None)
+        if "error" in response:
+            raise EmbeddingWorkerError(response["error"])
+        return response, payload
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        self.requests_total += 1
+        self.texts_total += len(texts)
+        response, payload = await self._request({"op": "embed", "texts": texts})
+        return unpack_vectors(payload, response["count"], response["dim"])
+
+    async def worker_stats(self) -> Dict[str, Any]:
+        response, _ = await self._request({"op": "stats"})
+        return {
+            **response["stats"],
+            "client_requests_total": self.requests_total,
+            "client_texts_total": self.texts_total,
+        }
@@ -0,0 +1,125 @@
+from __future__ import annotations
+import asyncio
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import AsyncGenerator, List, Tuple
+
+from fastapi import HTTPException
+from loguru import logger
+
+from app.config import get_settings
+
+try:
+    from pypdf import PdfReader
+except Exception:  # noqa: BLE001
+    PdfReader = None
+
+try:
+    import docx
+except Exception:  # noqa: BLE001
+    docx = None
+
+settings = get_settings()
+
+_executor: ProcessPoolExecutor | None = None
+
+# Lives in each worker process: consecutive page ranges of one file reuse the
+# parsed cross-reference table instead of re-opening the PDF.
+_reader_cache: Tuple[str, PdfReader] | None = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.per_worker(settings.EXTRACTION_PROCESSES),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def split_paragraphs(text: str) -> List[str]:
+    return [para.strip() for para in text.split("\n\n") if para.strip()]
+
+
+def _open_pdf(path: str) -> PdfReader:
+    global _reader_cache
+    if _reader_cache is None or _reader_cache[0] != path:
+        _reader_cache = (path, PdfReader(path))
+    return _reader_cache[1]
+
+
+def _pdf_page_count(path: str) -> int:
+    return len(_open_pdf(path).pages)
+
+
+def _extract_pdf_pages(path: str, start: int, stop: int) -> List[Tuple[int, List[str], float]]:
+    reader = _open_pdf(path)
+    pages = []
+    for i in range(start, stop):
+        started = time.perf_counter()
+        page_text = reader.pages[i].extract_text() or ""
+        pages.append((i + 1, split_paragraphs(page_text), time.perf_counter() - started))
+    return pages
+
+
+def _extract_docx(path: str) -> List[Tuple[int, List[str], float]]:
+    started = time.perf_counter()
+    document = docx.Document(path)
+    paragraphs = [p.text.strip() for p in document.paragraphs if p.text.strip()]
+    return [(1, paragraphs, time.perf_counter() - started)]
+
+
+async def iter_pages(
+    file_path: str | Path,
+    file_type: str,
+) -> AsyncGenerator[Tuple[int, List[str]], None]:
+    """Yield (page_number, paragraphs) in page order as the process pool finishes them."""
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    path = str(file_path)
+
+    if file_type == "pdf":
+        if PdfReader is None:
+            raise HTTPException(status_code=500, detail="PDF support not available.")
+
+        page_count = await loop.run_in_executor(executor, _pdf_page_count, path)
+        step = max(settings.EXTRACTION_PAGES_PER_TASK, 1)
+        ranges = deque((start, min(start + step, page_count)) for start in range(0, page_count, step))
+        max_in_flight = max(settings.per_worker(settings.EXTRACTION_PROCESSES), 1) * 2
+        in_flight: deque[asyncio.Future] = deque()
+
+        try:
+            while ranges or in_flight:
+                while ranges and len(in_flight) < max_in_flight:
+                    start, stop = ranges.popleft()
+                    in_flight.append(loop.run_in_executor(executor, _extract_pdf_pages, path, start, stop))
+
+                for page_number, paragraphs, elapsed in await in_flight.popleft():
+                    logger.info(f"Extracted page {page_number}/{page_count} of {path} in {elapsed:.3f}s")
+                    yield page_number, paragraphs
+        finally:
+            for future in in_flight:
+                future.cancel()
+        return
+
+    if file_type == "docx":
+        if docx is None:
+            raise HTTPException(status_code=500, detail="DOCX support not available.")
+
+        for page_number, paragraphs, elapsed in await loop.run_in_executor(executor, _extract_docx, path):
+            logger.info(f"Extracted {len(paragraphs)} paragraphs of {path} in {elapsed:.3f}s")
+            yield page_number, paragraphs
+        return
+
+    raise HTTPException(status_code=400, detail="Only PDF and DOCX files are supported.")
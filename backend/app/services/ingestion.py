@@ -0,0 +1,316 @@
+from __future__ import annotations
+import asyncio
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List
+from uuid import UUID
+
+from loguru import logger
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.db import async_session_factory
+from app.models import Document, DocumentChunk, IngestionJob
+from app.services.answer_cache import invalidate_document
+from app.services.embedding import process_and_store_document_chunks
+from app.services.ingestion_pipeline import PipelineFile, ingest_files
+from app.services.reingest import reingest_document
+from app.tracing import trace
+
+settings = get_settings()
+
+
+def enqueue_document(db: AsyncSession, document: Document, batch_id: UUID | None = None) -> IngestionJob:
+    document.status = "queued"
+    job = IngestionJob(document_id=document.id, batch_id=batch_id, status="queued", attempts=0)
+    db.add(job)
+    return job
+
+
+def enqueue_reingest(
+    db: AsyncSession,
+    document: Document,
+    source_path: str,
+    source_filename: str | None,
+    source_hash: str,
+) -> IngestionJob:
+    # The document stays as it is, and searchable, until the new version is applied.
+    job = IngestionJob(
+        document_id=document.id,
+        kind="reingest",
+        source_path=source_path,
+        source_filename=source_filename,
+        source_hash=source_hash,
+        status="queued",
+        attempts=0,
+    )
+    db.add(job)
+    return job
+
+
+async def claim_jobs(db: AsyncSession, limit: int = 1) -> List[IngestionJob]:
+    """Claim the oldest claimable job, plus up to limit - 1 more from its upload batch."""
+    now = datetime.now(timezone.utc)
+    stale_before = now - timedelta(seconds=settings.INGESTION_JOB_LEASE_SECONDS)
+
+    # A running job whose heartbeat stopped belongs to a worker that died
+    # (or a restart), so it is claimable again.
+    result = await db.execute(
+        select(IngestionJob)
+        .where(
+            or_(
+                IngestionJob.status == "queued",
+                and_(
+                    IngestionJob.status == "running",
+                    IngestionJob.heartbeat_at < stale_before,
+                ),
+            )
+        )
+        .order_by(IngestionJob.created_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    jobs = result.scalars().all()
+    if not jobs:
+        await db.rollback()
+        return []
+    # Only files uploaded together are pipelined together; the other rows
+    # are unlocked again by the commit below.
+    first = jobs[0]
+    jobs = [job for job in jobs if job is first or (first.batch_id is not None and job.batch_id == first.batch_id)]
+
+    claimed = []
+    for job in jobs:
+        document = await db.get(Document, job.document_id)
+        if job.attempts >= settings.INGESTION_MAX_ATTEMPTS:
+            job.status = "failed"
+            job.finished_at = now
+            job.error = job.error or "Job exceeded the maximum number of attempts."
+            if job.kind == "reingest":
+                Path(job.source_path).unlink(missing_ok=True)
+            else:
+                document.status = "failed"
+            logger.warning(f"Ingestion job {job.id} failed after {job.attempts} attempts")
+            continue
+
+        job.status = "running"
+        job.attempts += 1
+        job.started_at = now
+        job.heartbeat_at = now
+        if job.kind != "reingest":
+            document.status = "processing"
+        claimed.append(job)
+    await db.commit()
+    return claimed
+
+
+async def _heartbeat(job_ids: List[UUID]) -> None:
+    interval = max(settings.INGESTION_JOB_LEASE_SECONDS / 4, 1)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with async_session_factory() as db:
+                await db.execute(
+                    update(IngestionJob)
+                    .where(IngestionJob.id.in_(job_ids), IngestionJob.status == "running")
+                    .values(heartbeat_at=datetime.now(timezone.utc))
+                )
+                await db.commit()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  # noqa: BLE001
+            # Keep beating: a stopped heartbeat lets another worker re-claim
+            # the job while it is still running.
+            logger.warning(f"Heartbeat for ingestion jobs {job_ids} failed: {exc}")
+
+
+async def _finish_job(
+    job_id: UUID,
+    error: str | None = None,
+    requeue: bool = False,
+    page_count: int | None = None,
+    chunk_count: int | None = None,
+) -> None:
+    async with async_session_factory() as db:
+        job = await db.get(IngestionJob, job_id)
+        document = await db.get(Document, job.document_id)
+        job.page_count = page_count
+        job.chunk_count = chunk_count
+        if error is None:
+            job.status = "done"
+            job.error = None
+            document.status = "ready"
+            await invalidate_document(db, document.id)
+        elif requeue or job.attempts < settings.INGESTION_MAX_ATTEMPTS:
+            job.status = "queued"
+            job.error = error
+            if job.kind != "reingest":
+                document.status = "queued"
+        else:
+            job.status = "failed"
+            job.error = error
+            if job.kind == "reingest":
+                # Applied in one transaction, so the previous version is intact.
+                Path(job.source_path).unlink(missing_ok=True)
+            else:
+                document.status = "failed"
+                # Chunks are committed in batches, so a failed run can leave some behind.
+                await db.execute(delete(DocumentChunk).where(DocumentChunk.document_id == document.id))
+        if job.status in ("done", "failed"):
+            job.finished_at = datetime.now(timezone.utc)
+        await db.commit()
+
+
+async def run_job(job: IngestionJob) -> None:
+    with trace("ingestion_job", request_id=f"job-{job.id}", document_id=str(job.document_id), kind=job.kind):
+        await _run_job(job)
+
+
+async def _ingest_document(job: IngestionJob) -> tuple[int, int]:
+    async with async_session_factory() as db:
+        document = await db.get(Document, job.document_id)
+
+        # Drop chunks left behind by an interrupted earlier attempt.
+        await db.execute(delete(DocumentChunk).where(DocumentChunk.document_id == document.id))
+
+        logger.info(f"Embedding document {document.id} (attempt {job.attempts})...")
+        return await process_and_store_document_chunks(
+            document.filename, str(document.id), db=db, file_type=document.file_type
+        )
+
+
+async def _run_job(job: IngestionJob) -> None:
+    heartbeat = asyncio.create_task(_heartbeat([job.id]))
+    try:
+        if job.kind == "reingest":
+            logger.info(f"Re-ingesting document {job.document_id} from {job.source_path} (attempt {job.attempts})...")
+            page_count, chunk_count = await reingest_document(job)
+        else:
+            page_count, chunk_count = await _ingest_document(job)
+    except asyncio.CancelledError:
+        await _finish_job(job.id, error="Worker stopped before the job finished.", requeue=True)
+        raise
+    except Exception as exc:  # noqa: BLE001
+        logger.exception(f"Ingestion job {job.id} failed: {exc}")
+        await _finish_job(job.id, error=str(exc))
+    else:
+        await _finish_job(job.id, page_count=page_count, chunk_count=chunk_count)
+        logger.info(f"Document {job.document_id} embedded successfully")
+    finally:
+        heartbeat.cancel()
+
+
+async def run_jobs(jobs: List[IngestionJob]) -> None:
+    """Run several claimed jobs of one upload batch through the pipelined ingester."""
+    with trace("ingestion_batch", request_id=f"batch-{jobs[0].batch_id}", jobs=len(jobs)):
+        await _run_jobs(jobs)
+
+
+async def _finish_file(file: PipelineFile) -> None:
+    await _finish_job(file.job_id, error=file.error, page_count=file.pages, chunk_count=file.chunks)
+    if file.error is None:
+        logger.info(f"Document {file.document_id} embedded successfully")
+
+
+async def _run_jobs(jobs: List[IngestionJob]) -> None:
+    heartbeat = asyncio.create_task(_heartbeat([job.id for job in jobs]))
+    files: List[PipelineFile] = []
+    try:
+        async with async_session_factory() as db:
+            document_ids = [job.document_id for job in jobs]
+            await db.execute(delete(DocumentChunk).where(DocumentChunk.document_id.in_(document_ids)))
+            await db.commit()
+            documents = {
+                document.id: document
+                for document in (await db.execute(select(Document).where(Document.id.in_(document_ids)))).scalars()
+            }
+        files = [
+            PipelineFile(
+                job_id=job.id,
+                document_id=job.document_id,
+                path=documents[job.document_id].filename,
+                file_type=documents[job.document_id].file_type,
+            )
+            for job in jobs
+        ]
+        logger.info(f"Ingesting {len(files)} documents of batch {jobs[0].batch_id} as one pipeline...")
+        await ingest_files(files, _finish_file)
+    except asyncio.CancelledError:
+        for job in jobs:
+            if not any(file.job_id == job.id and file.finished for file in files):
+                await _finish_job(job.id, error="Worker stopped before the job finished.", requeue=True)
+        raise
+    except Exception as exc:  # noqa: BLE001
+        logger.exception(f"Ingestion of batch {jobs[0].batch_id} failed: {exc}")
+        for job in jobs:
+            if not any(file.job_id == job.id and file.finished for file in files):
+                await _finish_job(job.id, error=str(exc))
+    finally:
+        heartbeat.cancel()
+
+
+class IngestionWorkerPool:
+    def __init__(self, concurrency: int, poll_interval: float) -> None:
+        self._concurrency = concurrency
+        self._poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(n), name=f"ingestion-worker-{n}")
+            for n in range(self._concurrency)
+        ]
+        logger.info(f"Started {self._concurrency} ingestion workers")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        self._wakeup.set()
+
+    async def _wait_for_work(self) -> None:
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self._poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            try:
+                async with async_session_factory() as db:
+                    jobs = await claim_jobs(db, limit=settings.INGESTION_PIPELINE_MAX_FILES)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # noqa: BLE001
+                logger.error(f"Ingestion worker {n} could not claim a job: {exc}")
+                jobs = []
+
+            if not jobs:
+                await self._wait_for_work()
+                continue
+
+            try:
+                if len(jobs) == 1:
+                    await run_job(jobs[0])
+                else:
+                    await run_jobs(jobs)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # noqa: BLE001
+                # e.g. recording the outcome failed; the lease lets another
+                # worker retry the jobs, and this worker keeps going.
+                logger.exception(f"Ingestion worker {n} failed running {len(jobs)} job(s): {exc}")
+
+
+worker_pool = IngestionWorkerPool(
+    concurrency=settings.per_worker(settings.INGESTION_WORKERS),
+    poll_interval=settings.INGESTION_POLL_INTERVAL_SECONDS,
+)
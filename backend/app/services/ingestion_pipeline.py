@@ -0,0 +1,181 @@
+from __future__ import annotations
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Dict, List, Tuple
+from uuid import UUID
+
+from loguru import logger
+
+from app.config import get_settings
+from app.db import async_session_factory
+from app.metrics import INGESTION_CHUNKS_TOTAL, INGESTION_PAGES_TOTAL, INGESTION_STAGE_SECONDS
+from app.services.chunk_store import ChunkRecord, build_chunk_records, copy_chunks
+from app.services.chunking import Chunk, get_chunker
+from app.services.embedding import embedding_cache
+from app.services.extraction import iter_pages
+from app.tracing import span
+
+settings = get_settings()
+
+
+@dataclass(eq=False)
+class PipelineFile:
+    job_id: UUID
+    document_id: UUID
+    path: str
+    file_type: str
+    pages: int = 0
+    chunks: int = 0
+    error: str | None = None
+    finished: bool = False
+
+
+FinishFn = Callable[[PipelineFile], Awaitable[None]]
+
+# The chunk queue carries (file, chunk), and (file, None) once a file is fully
+# extracted. The record queue carries ({file: records}, files whose records are
+# all included). None ends either stream.
+
+
+async def _extract(files: Deque[PipelineFile], out: asyncio.Queue) -> None:
+    while files:
+        file = files.popleft()
+        chunker = get_chunker()
+        try:
+            async for page_number, paragraphs in iter_pages(file.path, file.file_type):
+                if file.error is not None:
+                    break  # a batch holding its chunks already failed
+                file.pages += 1
+                INGESTION_PAGES_TOTAL.inc()
+                for para in paragraphs:
+                    for chunk in chunker.add(page_number, para):
+                        await out.put((file, chunk))
+            for chunk in chunker.flush():
+                await out.put((file, chunk))
+        except Exception as exc:  # noqa: BLE001
+            logger.exception(f"Extraction of {file.path} failed: {exc}")
+            file.error = str(exc) or type(exc).__name__
+        await out.put((file, None))
+
+
+async def _embed_chunks(chunks: List[Chunk]) -> List[List[float]]:
+    async with async_session_factory() as db:
+        embeddings = await embedding_cache.embed(db, [chunk[1] for chunk in chunks])
+        # Keep the new cache rows, so other workers and later runs reuse them.
+        await db.commit()
+        return embeddings
+
+
+async def _embed(inbox: asyncio.Queue, out: asyncio.Queue) -> None:
+    batch: List[Tuple[PipelineFile, Chunk]] = []
+    extracted: List[PipelineFile] = []
+
+    async def flush() -> None:
+        records: Dict[PipelineFile, List[ChunkRecord]] = {}
+        grouped: Dict[PipelineFile, List[Chunk]] = {}
+        for file, chunk in batch:
+            grouped.setdefault(file, []).append(chunk)
+        if batch:
+            try:
+                with INGESTION_STAGE_SECONDS.labels("embed").time(), span("embed_batch", texts=len(batch)):
+                    embeddings = await _embed_chunks([chunk for _, chunk in batch])
+                offset = 0
+                for file, chunks in grouped.items():
+                    vectors = embeddings[offset:offset + len(chunks)]
+                    records[file] = build_chunk_records(file.document_id, chunks, vectors)
+                    offset += len(chunks)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning(f"Embedding a pipeline batch of {len(batch)} chunks failed, retrying per file: {exc}")
+                # Retry file by file so one bad file does not fail the others.
+                for file, chunks in grouped.items():
+                    try:
+                        records[file] = build_chunk_records(file.document_id, chunks, await _embed_chunks(chunks))
+                    except Exception as file_exc:  # noqa: BLE001
+                        logger.exception(f"Embedding chunks of {file.path} failed: {file_exc}")
+                        file.error = file.error or f"Embedding failed: {file_exc}"
+        await out.put((records, list(extracted)))
+        batch.clear()
+        extracted.clear()
+
+    while (item := await inbox.get()) is not None:
+        file, chunk = item
+        if chunk is None:
+            extracted.append(file)
+            # A file with nothing left in the batch can be finished right away;
+            # otherwise it waits for the batch, which keeps filling with the
+            # chunks of the files still being extracted.
+            if not any(owner is file for owner, _ in batch):
+                await out.put(({}, [extracted.pop()]))
+        elif file.error is None:
+            batch.append((file, chunk))
+            if len(batch) >= settings.INGESTION_EMBED_BATCH_SIZE:
+                await flush()
+    if batch or extracted:
+        await flush()
+    await out.put(None)
+
+
+async def _insert(inbox: asyncio.Queue, finish: FinishFn) -> None:
+    pending: Dict[PipelineFile, List[ChunkRecord]] = {}
+
+    async def write() -> None:
+        rows = [record for file, records in pending.items() if file.error is None for record in records]
+        if rows:
+            try:
+                with INGESTION_STAGE_SECONDS.labels("insert").time(), span("insert", rows=len(rows)):
+                    async with async_session_factory() as db:
+                        await copy_chunks(db, rows)
+                        await db.commit()
+            except Exception as exc:  # noqa: BLE001
+                logger.exception(f"Inserting {len(rows)} pipeline chunks failed: {exc}")
+                for file in pending:
+                    file.error = file.error or f"Insert failed: {exc}"
+            else:
+                INGESTION_CHUNKS_TOTAL.inc(len(rows))
+                for file, records in pending.items():
+                    file.chunks += len(records)
+        pending.clear()
+
+    while (item := await inbox.get()) is not None:
+        records, extracted = item
+        for file, file_records in records.items():
+            pending.setdefault(file, []).extend(file_records)
+        # Rows go out in CHUNK_INSERT_BATCH_SIZE batches, and a file is only
+        # finished once all of its rows are committed.
+        if extracted or sum(len(r) for r in pending.values()) >= settings.CHUNK_INSERT_BATCH_SIZE:
+            await write()
+        for file in extracted:
+            await finish(file)
+            file.finished = True
+
+
+async def ingest_files(files: List[PipelineFile], finish: FinishFn) -> None:
+    """Ingest several documents as one pipeline: extract -> embed -> insert.
+
+    Up to EXTRACTION_PROCESSES files are extracted at once, and their chunks
+    share embedding batches, so the embedder gets full batches while later
+    files are still parsing and small files do not each pay for a partial
+    batch. finish(file) is awaited as each file's rows are committed, with
+    file.error set if any stage failed for it; the other files carry on.
+    """
+    queue: Deque[PipelineFile] = deque(files)
+    chunks: asyncio.Queue = asyncio.Queue(maxsize=settings.INGESTION_EMBED_BATCH_SIZE * 4)
+    batches: asyncio.Queue = asyncio.Queue(maxsize=4)
+
+    async def extract_all() -> None:
+        extractors = max(min(settings.per_worker(settings.EXTRACTION_PROCESSES), len(files)), 1)
+        await asyncio.gather(*(_extract(queue, chunks) for _ in range(extractors)))
+        await chunks.put(None)
+
+    tasks = [
+        asyncio.create_task(extract_all(), name="pipeline-extract"),
+        asyncio.create_task(_embed(chunks, batches), name="pipeline-embed"),
+        asyncio.create_task(_insert(batches, finish), name="pipeline-insert"),
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,179 @@
+from __future__ import annotations
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+from uuid import UUID
+
+from loguru import logger
+from sqlalchemy import insert
+
+from app.config import get_settings
+from app.db import async_session_factory
+from app.metrics import (
+    MESSAGE_SINK_BATCH_SIZE,
+    MESSAGE_SINK_DROPPED_TOTAL,
+    MESSAGE_SINK_FLUSH_SECONDS,
+    MESSAGE_SINK_QUEUE_DEPTH,
+)
+from app.models import Message
+
+settings = get_settings()
+
+# (column values, future resolved with whether the row was written); None in
+# the queue ends the sink.
+Row = Tuple[Dict[str, Any], asyncio.Future]
+
+
+class MessageSink:
+    """Write-behind persistence for chat messages.
+
+    add_message only queues the row and returns its id with a future that
+    resolves to True once the row is committed (False if it was dropped), so
+    a chat request never waits on the database before streaming. A background
+    task inserts the queued rows in one transaction per batch, once
+    max_batch_size rows are waiting or the oldest has waited
+    flush_interval_ms. The conversation row must already exist. sync() waits
+    for a conversation's queued rows, for reads in this process that must see
+    them. stop() writes out whatever is still queued.
+    """
+
+    def __init__(self, max_batch_size: int, flush_interval_ms: float) -> None:
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue: asyncio.Queue[Row | None] | None = None
+        self._task: asyncio.Task | None = None
+        self._pending: Dict[UUID, int] = {}
+        self._flushed: asyncio.Condition | None = None
+        self._queued_rows = 0
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._flushed = asyncio.Condition()
+        self._task = asyncio.create_task(self._run(), name="message-sink")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._queue.put_nowait(None)
+        try:
+            await self._task
+        except Exception as exc:  # noqa: BLE001
+            logger.error(f"Message sink stopped with an error: {exc}")
+        self._task = None
+        self._queue = None
+        self._flushed = None
+
+    def add_message(
+        self,
+        conversation_id: UUID,
+        role: str,
+        content: str,
+        is_truncated: bool = False,
+    ) -> Tuple[UUID, asyncio.Future]:
+        self.start()
+        message_id = uuid.uuid4()
+        written = asyncio.get_running_loop().create_future()
+        # Timestamped now rather than at flush time, so turns keep their order.
+        values = {
+            "id": message_id,
+            "conversation_id": conversation_id,
+            "role": role,
+            "content": content,
+            "is_truncated": is_truncated,
+            "created_at": datetime.now(timezone.utc),
+        }
+        self._pending[conversation_id] = self._pending.get(conversation_id, 0) + 1
+        self._queued_rows += 1
+        MESSAGE_SINK_QUEUE_DEPTH.set(self._queued_rows)
+        self._queue.put_nowait((values, written))
+        return message_id, written
+
+    async def sync(self, conversation_id: UUID) -> None:
+        """Wait until the rows queued so far for a conversation are written (or dropped)."""
+        if not self._pending.get(conversation_id) or self._flushed is None:
+            return
+        async with self._flushed:
+            await self._flushed.wait_for(lambda: not self._pending.get(conversation_id))
+
+    async def _collect(self) -> List[Row | None]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.flush_interval
+
+        while len(batch) < self.max_batch_size and batch[-1] is not None:
+            if self._queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self._queue.get_nowait()
+            batch.append(item)
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            rows = [row for row in batch if row is not None]
+            if rows:
+                await self._flush(rows)
+            if batch[-1] is None:
+                return
+
+    async def _write(self, rows: List[Row]) -> None:
+        async with async_session_factory() as db:
+            await db.execute(insert(Message), [values for values, _ in rows])
+            await db.commit()
+
+    async def _flush(self, rows: List[Row]) -> None:
+        started = time.perf_counter()
+        dropped = set()
+        try:
+            await self._write(rows)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning(f"Message sink flush of {len(rows)} rows failed, retrying per conversation: {exc}")
+            # Retry conversation by conversation so one bad row (e.g. its
+            # conversation was deleted meanwhile) does not lose the others.
+            grouped: Dict[UUID, List[Row]] = {}
+            for row in rows:
+                grouped.setdefault(row[0]["conversation_id"], []).append(row)
+            for conversation_id, group in grouped.items():
+                try:
+                    await self._write(group)
+                except Exception as group_exc:  # noqa: BLE001
+                    message_ids = ", ".join(str(values["id"]) for values, _ in group)
+                    logger.error(
+                        f"Dropping {len(group)} messages of conversation {conversation_id} "
+                        f"({message_ids}): {group_exc}"
+                    )
+                    MESSAGE_SINK_DROPPED_TOTAL.inc(len(group))
+                    dropped.update(values["id"] for values, _ in group)
+        MESSAGE_SINK_FLUSH_SECONDS.observe(time.perf_counter() - started)
+        MESSAGE_SINK_BATCH_SIZE.observe(len(rows))
+
+        for values, future in rows:
+            if not future.done():
+                future.set_result(values["id"] not in dropped)
+            conversation_id = values["conversation_id"]
+            remaining = self._pending.get(conversation_id, 0) - 1
+            if remaining > 0:
+                self._pending[conversation_id] = remaining
+            else:
+                self._pending.pop(conversation_id, None)
+        self._queued_rows -= len(rows)
+        MESSAGE_SINK_QUEUE_DEPTH.set(self._queued_rows)
+        async with self._flushed:
+            self._flushed.notify_all()
+
+
+message_sink = MessageSink(
+    max_batch_size=settings.MESSAGE_SINK_MAX_BATCH_SIZE,
+    flush_interval_ms=settings.MESSAGE_SINK_FLUSH_INTERVAL_MS,
+)
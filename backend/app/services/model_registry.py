@@ -0,0 +1,118 @@
+from __future__ import annotations
+import json
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from loguru import logger
+
+from app.config import get_settings
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+settings = get_settings()
+
+
+class ModelRegistry:
+    """Owns the process-wide embedding model; loaded once from the app lifespan."""
+
+    def __init__(self) -> None:
+        self._embedding_model: SentenceTransformer | None = None
+        self._tokenizer = None
+        self._max_seq_length: int | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._embedding_model is not None
+
+    def _load_embedding_model(self) -> SentenceTransformer:
+        # Imported here so processes that embed through the embedding worker
+        # never pull in torch.
+        from sentence_transformers import SentenceTransformer
+
+        model_path = settings.EMBEDDING_MODEL_PATH
+        if not model_path:
+            raise RuntimeError("EMBEDDING_MODEL_PATH not set")
+
+        backend = settings.EMBEDDING_BACKEND
+        logger.info(f"Loading sentence-transformer model for embeddings: {model_path} (backend={backend})")
+        if backend == "onnx":
+            # Requires sentence-transformers[onnx]; point EMBEDDING_ONNX_FILE at
+            # e.g. onnx/model_qint8_avx512_vnni.onnx for int8 inference.
+            model_kwargs = {}
+            if settings.EMBEDDING_ONNX_FILE:
+                model_kwargs["file_name"] = settings.EMBEDDING_ONNX_FILE
+            return SentenceTransformer(model_path, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+        if backend != "torch":
+            raise RuntimeError(f"Unsupported EMBEDDING_BACKEND: {backend}")
+        return SentenceTransformer(model_path, device="cpu")
+
+    def load(self) -> SentenceTransformer:
+        with self._lock:
+            if self._embedding_model is None:
+                model = self._load_embedding_model()
+                self._warmup(model)
+                self._embedding_model = model
+            return self._embedding_model
+
+    def _warmup(self, model: SentenceTransformer) -> None:
+        started = time.perf_counter()
+        model.encode(["warmup"] * settings.EMBEDDING_WARMUP_BATCH_SIZE, normalize_embeddings=True)
+        logger.info(f"Embedding model warmed up in {time.perf_counter() - started:.2f}s")
+
+    @property
+    def embedding_model(self) -> SentenceTransformer:
+        # Lazily loads for scripts that never run the app lifespan (benchmarks).
+        if self._embedding_model is None:
+            return self.load()
+        return self._embedding_model
+
+    def _load_tokenizer(self) -> None:
+        from transformers import AutoTokenizer
+
+        model_path = settings.EMBEDDING_MODEL_PATH
+        logger.info(f"Loading embedding tokenizer: {model_path}")
+        tokenizer = AutoTokenizer.from_pretrained(model_path)
+        max_seq_length = None
+        config_file = Path(model_path) / "sentence_bert_config.json"
+        if config_file.exists():
+            max_seq_length = json.loads(config_file.read_text()).get("max_seq_length")
+        self._max_seq_length = max_seq_length or min(tokenizer.model_max_length, 512)
+        self._tokenizer = tokenizer
+
+    def load_tokenizer(self) -> None:
+        """Startup for processes that embed through the embedding worker and only chunk locally."""
+        with self._lock:
+            if self._embedding_model is None and self._tokenizer is None:
+                self._load_tokenizer()
+
+    @property
+    def tokenizer(self):
+        """The embedding model's tokenizer, loaded on its own if the model is not."""
+        if self._embedding_model is not None:
+            return self._embedding_model.tokenizer
+        with self._lock:
+            if self._tokenizer is None:
+                self._load_tokenizer()
+            return self._tokenizer
+
+    @property
+    def max_seq_length(self) -> int:
+        """Tokens the embedding model reads per text; anything past it is truncated."""
+        if self._embedding_model is not None:
+            return self._embedding_model.max_seq_length
+        with self._lock:
+            if self._tokenizer is None:
+                self._load_tokenizer()
+            return self._max_seq_length
+
+    def unload(self) -> None:
+        with self._lock:
+            self._embedding_model = None
+            self._tokenizer = None
+
+
+model_registry = ModelRegistry()
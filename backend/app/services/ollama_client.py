@@ -1,20 +1,251 @@
 from __future__ import annotations
-from typing import Any, AsyncGenerator, Dict
+import asyncio
+import time
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List
 import httpx
+import orjson
+from fastapi import HTTPException
 from loguru import logger
 from app.config import get_settings
+from app.metrics import (
+    OLLAMA_GENERATED_TOKENS_TOTAL,
+    OLLAMA_IN_FLIGHT,
+    OLLAMA_REJECTED_TOTAL,
+    OLLAMA_TIME_TO_FIRST_TOKEN_SECONDS,
+    OLLAMA_TOKENS_PER_SECOND,
+    OLLAMA_WAITING,
+)
+from app.tracing import span
 
 
 settings = get_settings()
 
+_client: httpx.AsyncClient | None = None
 
-def _get_client() -> httpx.AsyncClient:
+
+def _create_client() -> httpx.AsyncClient:
     return httpx.AsyncClient(
         base_url=settings.ollama_base_url,
-        timeout=60.0,
+        timeout=httpx.Timeout(settings.OLLAMA_TIMEOUT_SECONDS, connect=5.0),
+        limits=httpx.Limits(
+            max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.OLLAMA_KEEPALIVE_EXPIRY_SECONDS,
+        ),
     )
 
 
+def start_client() -> None:
+    global _client
+    if _client is None:
+        _client = _create_client()
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    start_client()
+    return _client
+
+
+class ConcurrencyLimiter:
+    """Caps in-flight generations and the number of requests allowed to wait for a slot."""
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float) -> None:
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+        self.waiting = 0
+
+    def _busy(self) -> HTTPException:
+        OLLAMA_REJECTED_TOTAL.inc()
+        return HTTPException(
+            status_code=503,
+            detail="The language model is busy, please retry shortly.",
+            headers={"Retry-After": str(settings.OLLAMA_RETRY_AFTER_SECONDS)},
+        )
+
+    async def acquire(self) -> None:
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            logger.warning(f"Ollama queue full ({self.waiting} waiting, {self.in_flight} in flight)")
+            raise self._busy()
+
+        self.waiting += 1
+        OLLAMA_WAITING.set(self.waiting)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._busy()
+        finally:
+            self.waiting -= 1
+            OLLAMA_WAITING.set(self.waiting)
+        self.in_flight += 1
+        OLLAMA_IN_FLIGHT.set(self.in_flight)
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        OLLAMA_IN_FLIGHT.set(self.in_flight)
+        self._semaphore.release()
+
+
+limiter = ConcurrencyLimiter(
+    max_concurrent=settings.per_worker(settings.OLLAMA_MAX_CONCURRENT),
+    max_queue=settings.per_worker(settings.OLLAMA_MAX_QUEUE),
+    queue_timeout=settings.OLLAMA_QUEUE_TIMEOUT_SECONDS,
+)
+
+
+def _observe_generation(final: Dict[str, Any], streamed_chunks: int, first_token_at: float | None) -> None:
+    # Ollama reports eval_count/eval_duration (ns) on the final chunk; fall
+    # back to counting streamed chunks against wall time.
+    eval_count = final.get("eval_count")
+    eval_duration = final.get("eval_duration")
+    if eval_count and eval_duration:
+        OLLAMA_GENERATED_TOKENS_TOTAL.inc(eval_count)
+        OLLAMA_TOKENS_PER_SECOND.observe(eval_count / (eval_duration / 1e9))
+    elif streamed_chunks and first_token_at is not None:
+        elapsed = time.perf_counter() - first_token_at
+        OLLAMA_GENERATED_TOKENS_TOTAL.inc(streamed_chunks)
+        if elapsed > 0:
+            OLLAMA_TOKENS_PER_SECOND.observe(streamed_chunks / elapsed)
+
+
+# Timing fields of Ollama's final chunk, passed through to clients as stats.
+GENERATION_STATS_FIELDS = (
+    "total_duration",
+    "load_duration",
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration",
+)
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncGenerator[Dict[str, Any], None]:
+    """Decode newline-delimited JSON from raw byte chunks, splitting lines incrementally."""
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(b"\n", start)) != -1:
+            line = bytes(buffer[start:end])
+            start = end + 1
+            if line.strip():
+                try:
+                    yield orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    logger.warning(f"Skipping undecodable stream line: {line[:200]!r}")
+        del buffer[:start]
+    if buffer.strip():
+        try:
+            yield orjson.loads(bytes(buffer))
+        except orjson.JSONDecodeError:
+            logger.warning(f"Skipping undecodable stream line: {bytes(buffer[:200])!r}")
+
+
+# Ends the token queue of a ChatStream.
+_END = object()
+
+
+class ChatStream:
+    """Token stream that owns one limiter slot until it finishes or is closed.
+
+    The upstream request runs in its own task feeding a queue, so cancel()
+    can abort it from anywhere (e.g. a disconnect watcher) while a consumer is
+    waiting on the next token: the HTTP stream to Ollama is closed, which
+    stops the generation and frees the slot straight away. Once the stream
+    is exhausted, stats holds the generation timings Ollama reported on its
+    final chunk.
+    """
+
+    def __init__(self, payload: Dict[str, Any]) -> None:
+        self._payload = payload
+        self._released = False
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._producer: asyncio.Task | None = None
+        self.cancelled = False
+        self.stats: Dict[str, Any] = {}
+
+    def _release(self) -> None:
+        if not self._released:
+            self._released = True
+            limiter.release()
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._stream_generator()
+
+    async def _produce(self) -> None:
+        started = time.perf_counter()
+        first_token_at = None
+        tokens = 0
+        try:
+            async with _get_client().stream(
+                "POST",
+                "/api/chat",
+                json=self._payload,
+            ) as resp:
+                resp.raise_for_status()
+
+                async for data in iter_ndjson(resp.aiter_bytes()):
+                    if data.get("done"):
+                        _observe_generation(data, tokens, first_token_at)
+                        self.stats = {key: data[key] for key in GENERATION_STATS_FIELDS if key in data}
+
+                    message = data.get("message", {})
+                    content = message.get("content")
+
+                    if content:
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                            OLLAMA_TIME_TO_FIRST_TOKEN_SECONDS.observe(first_token_at - started)
+                        tokens += 1
+                        self._queue.put_nowait(content)
+
+        except asyncio.CancelledError:
+            if not self.stats:
+                self.cancelled = True
+                logger.info(f"Ollama generation cancelled after {tokens} chunks")
+            raise
+        except Exception as exc:  # noqa: BLE001
+            logger.error(f"Ollama streaming error: {exc}")
+            self._queue.put_nowait(exc)
+        finally:
+            self._queue.put_nowait(_END)
+            self._release()
+
+    async def _stream_generator(self) -> AsyncGenerator[str, None]:
+        if self._producer is None:
+            self._producer = asyncio.create_task(self._produce(), name="ollama-stream")
+        try:
+            while (item := await self._queue.get()) is not _END:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Nobody is left to read the tokens, so stop generating them.
+            self.cancel()
+
+    def cancel(self) -> None:
+        """Abort the generation; a waiting consumer sees the stream end."""
+        if self._producer is not None and not self._producer.done():
+            self._producer.cancel()
+
+    async def aclose(self) -> None:
+        self.cancel()
+        if self._producer is not None:
+            await asyncio.gather(self._producer, return_exceptions=True)
+        # Safety net for streams that were never iterated (e.g. the client
+        # disconnected before the response started).
+        self._release()
+
+
 async def chat_completion(
     prompt: str,
     system_prompt: str,
@@ -22,7 +253,8 @@ async def chat_completion(
     top_p: int = 0.8,
     top_k: int = 20,
     num_predict: int = 300,
-) -> AsyncGenerator[str, None]:
+    history: List[Dict[str, str]] | None = None,
+) -> ChatStream:
     payload: Dict[str, Any] = {
         "model": settings.OLLAMA_MODEL_NAME,
         "messages": [],
@@ -37,40 +269,40 @@ async def chat_completion(
         {"role": "system", "content": system_prompt}
     )
 
+    if history:
+        payload["messages"].extend(history)
+
     payload["messages"].append(
         {"role": "user", "content": prompt}
     )
 
-    client = _get_client()
-
-    async def _stream_generator() -> AsyncGenerator[str, None]:
-        try:
-            async with client.stream(
-                "POST",
-                "/api/chat",
-                json=payload,
-            ) as resp:
-                resp.raise_for_status()
-
-                async for line in resp.aiter_lines():
-                    if not line:
-                        continue
+    with span("ollama_queue"):
+        await limiter.acquire()
+    return ChatStream(payload)
 
-                    try:
-                        data = httpx.Response(200, text=line).json()
-                    except Exception:
-                        continue
-
-                    message = data.get("message", {})
-                    content = message.get("content")
-
-                    if content:
-                        yield content
 
-        except Exception as exc:  # noqa: BLE001
-            logger.error(f"Ollama streaming error: {exc}")
-            raise
-        finally:
-            await client.aclose()
+async def complete(
+    messages: List[Dict[str, str]],
+    temperature: float = 0.2,
+    num_predict: int = 300,
+) -> str:
+    """Non-streaming chat call for background work; shares the generation limiter."""
+    payload: Dict[str, Any] = {
+        "model": settings.OLLAMA_MODEL_NAME,
+        "messages": messages,
+        "temperature": temperature,
+        "num_predict": num_predict,
+        "stream": False,
+    }
 
-    return _stream_generator()
+    with span("ollama_queue"):
+        await limiter.acquire()
+    try:
+        with span("ollama_complete"):
+            resp = await _get_client().post("/api/chat", json=payload)
+        resp.raise_for_status()
+        data = resp.json()
+        _observe_generation(data, 0, None)
+        return data.get("message", {}).get("content", "")
+    finally:
+        limiter.release()
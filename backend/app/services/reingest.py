@@ -0,0 +1,158 @@
+from __future__ import annotations
+import os
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Deque, Dict, List, Sequence, Tuple
+from uuid import UUID
+
+from loguru import logger
+from sqlalchemy import delete, select, update
+
+from app.db import async_session_factory
+from app.metrics import INGESTION_CHUNKS_TOTAL, INGESTION_PAGES_TOTAL, INGESTION_STAGE_SECONDS
+from app.models import Document, DocumentChunk, IngestionJob
+from app.services.answer_cache import invalidate_document
+from app.services.chunk_store import build_chunk_records, copy_chunks
+from app.services.chunking import Chunk, get_chunker
+from app.services.embedding import embedding_cache
+from app.services.embedding_cache import content_hash
+from app.services.extraction import iter_pages
+from app.tracing import span
+
+
+@dataclass
+class ChunkDiff:
+    unchanged: int = 0
+    # Existing rows whose position, page or section changed; vectors are kept.
+    updates: List[Dict] = field(default_factory=list)
+    new: List[Chunk] = field(default_factory=list)
+    removed: List[UUID] = field(default_factory=list)
+
+
+def diff_chunks(existing: Sequence, chunks: List[Chunk]) -> ChunkDiff:
+    """Match the new chunk list against a document's rows.
+
+    A chunk matches the row at the same chunk_index with the same content
+    hash, else any unclaimed row with the same hash (text that moved because
+    something was inserted or removed before it). Unmatched chunks are new and
+    unmatched rows are removed. existing rows need id, chunk_index,
+    content_hash, page_number and section.
+    """
+    diff = ChunkDiff()
+    by_position = {(row.chunk_index, row.content_hash): row for row in existing}
+    by_hash: Dict[str, Deque] = defaultdict(deque)
+    for row in sorted(existing, key=lambda row: row.chunk_index):
+        by_hash[row.content_hash].append(row)
+
+    claimed = set()
+    unmatched: List[Tuple[Chunk, str]] = []
+    for chunk in chunks:
+        key = content_hash(chunk[1])
+        row = by_position.get((chunk[0], key))
+        if row is None or row.id in claimed:
+            unmatched.append((chunk, key))
+            continue
+        claimed.add(row.id)
+        if (row.page_number, row.section or "") == (chunk[2], chunk[3] or ""):
+            diff.unchanged += 1
+        else:
+            diff.updates.append({"id": row.id, "chunk_index": chunk[0], "page_number": chunk[2], "section": chunk[3]})
+
+    for chunk, key in unmatched:
+        candidates = by_hash.get(key)
+        while candidates and candidates[0].id in claimed:
+            candidates.popleft()
+        if not candidates:
+            diff.new.append(chunk)
+            continue
+        row = candidates.popleft()
+        claimed.add(row.id)
+        diff.updates.append({"id": row.id, "chunk_index": chunk[0], "page_number": chunk[2], "section": chunk[3]})
+
+    diff.removed = [row.id for row in existing if row.id not in claimed]
+    return diff
+
+
+async def _chunk_file(path: str, file_type: str) -> Tuple[int, List[Chunk]]:
+    chunker = get_chunker()
+    chunks: List[Chunk] = []
+    pages = 0
+    async for page_number, paragraphs in iter_pages(path, file_type):
+        pages += 1
+        INGESTION_PAGES_TOTAL.inc()
+        with INGESTION_STAGE_SECONDS.labels("chunk").time():
+            for para in paragraphs:
+                chunks.extend(chunker.add(page_number, para))
+    chunks.extend(chunker.flush())
+    return pages, chunks
+
+
+async def reingest_document(job: IngestionJob) -> Tuple[int, int]:
+    """Apply a revised file to a document, embedding only the chunks that changed.
+
+    The unchanged rows keep their vectors; deletes, moves and inserts are
+    applied in one transaction together with the document's new file
+    metadata, so searches see either the old version or the new one. Returns
+    (pages, chunks) of the new version.
+    """
+    source_path = job.source_path
+    file_type = Path(source_path).suffix.lstrip(".")
+    with span("reingest_chunk"):
+        pages, chunks = await _chunk_file(source_path, file_type)
+
+    async with async_session_factory() as db:
+        existing = (
+            await db.execute(
+                select(
+                    DocumentChunk.id,
+                    DocumentChunk.chunk_index,
+                    DocumentChunk.content_hash,
+                    DocumentChunk.page_number,
+                    DocumentChunk.section,
+                ).where(DocumentChunk.document_id == job.document_id)
+            )
+        ).all()
+    diff = diff_chunks(existing, chunks)
+
+    embeddings: List[List[float]] = []
+    if diff.new:
+        # Text seen before anywhere (an earlier version, another document)
+        # still comes from the embedding cache rather than the model.
+        with INGESTION_STAGE_SECONDS.labels("embed").time():
+            async with async_session_factory() as db:
+                embeddings = await embedding_cache.embed(db, [chunk[1] for chunk in diff.new])
+                await db.commit()
+
+    async with async_session_factory() as db:
+        with INGESTION_STAGE_SECONDS.labels("insert").time(), span("reingest_apply"):
+            document = await db.get(Document, job.document_id, with_for_update=True)
+            if diff.removed:
+                await db.execute(delete(DocumentChunk).where(DocumentChunk.id.in_(diff.removed)))
+            if diff.updates:
+                await db.execute(update(DocumentChunk), diff.updates)
+            await copy_chunks(db, build_chunk_records(document.id, diff.new, embeddings))
+
+            old_path = document.filename
+            # Same type: the revised file takes the old path, so callers that
+            # refer to the document by filename keep working.
+            new_path = old_path if Path(old_path).suffix == Path(source_path).suffix else source_path
+            document.filename = new_path
+            document.file_type = file_type
+            document.content_hash = job.source_hash
+            if job.source_filename:
+                document.original_filename = job.source_filename
+            document.status = "ready"
+            await invalidate_document(db, document.id)
+            await db.commit()
+
+    if new_path == old_path:
+        os.replace(source_path, old_path)
+    else:
+        Path(old_path).unlink(missing_ok=True)
+    INGESTION_CHUNKS_TOTAL.inc(len(diff.new))
+    logger.info(
+        f"Re-ingested document {job.document_id}: {diff.unchanged} unchanged, {len(diff.updates)} moved, "
+        f"{len(diff.new)} embedded, {len(diff.removed)} removed"
+    )
+    return pages, len(chunks)
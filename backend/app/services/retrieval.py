@@ -0,0 +1,283 @@
+from __future__ import annotations
+import asyncio
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+from uuid import UUID
+
+from loguru import logger
+from pgvector.sqlalchemy import BIT, HALFVEC, Vector
+from sqlalchemy import cast, func, literal, literal_column, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.db import read_session_factory
+from app.models import DocumentChunk
+from app.services.embedding import embed_texts
+from app.tracing import traced
+
+settings = get_settings()
+
+EMBEDDING_DIM = 384
+
+
+@dataclass
+class RetrievedChunk:
+    chunk_index: int
+    content: str
+    page_number: int | None
+    section: str | None
+    distance: float | None = None
+    score: float = 0.0
+
+
+async def _set_search_params(db: AsyncSession, limit: int) -> None:
+    # SET does not take bind parameters; values come from typed settings.
+    if settings.VECTOR_INDEX_TYPE == "ivfflat":
+        await db.execute(text(f"SET LOCAL ivfflat.probes = {int(settings.IVFFLAT_PROBES)}"))
+        prefix = "ivfflat"
+    else:
+        ef_search = max(int(settings.HNSW_EF_SEARCH), int(limit))
+        await db.execute(text(f"SET LOCAL hnsw.ef_search = {ef_search}"))
+        prefix = "hnsw"
+
+    # Without iterative scans a filtered ANN query only sees ef_search/probes
+    # candidates, so a small document can come back with fewer than top_k hits.
+    if settings.VECTOR_ITERATIVE_SCAN in ("relaxed_order", "strict_order"):
+        await db.execute(text(f"SET LOCAL {prefix}.iterative_scan = {settings.VECTOR_ITERATIVE_SCAN}"))
+
+
+async def check_vector_indexes() -> None:
+    """Fail startup if the ANN indexes do not match VECTOR_INDEX_TYPE / VECTOR_SEARCH_MODE.
+
+    Migrations build the indexes for the settings they ran with; changing the
+    settings afterwards would otherwise tune (SET ivfflat.probes) or query
+    (halfvec, binary) indexes that do not exist, and search would quietly
+    fall back to sequential scans.
+    """
+    from sqlalchemy.dialects import postgresql
+    from sqlalchemy.schema import CreateIndex
+
+    expected = [
+        index for index in DocumentChunk.__table__.indexes
+        if index.name.startswith("ix_document_chunks_embedding")
+    ]
+    async with read_session_factory() as db:
+        rows = await db.execute(
+            text("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = 'document_chunks'")
+        )
+        existing = {row.indexname: row.indexdef for row in rows}
+
+    problems = []
+    for index in expected:
+        method = index.dialect_options["postgresql"]["using"]
+        definition = existing.get(index.name)
+        if definition is None or f" USING {method} " not in definition:
+            found = "missing" if definition is None else f"found {definition}"
+            ddl = str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+            problems.append(f"{index.name} ({found}); expected: {ddl}")
+    if problems:
+        raise RuntimeError(
+            f"Vector indexes do not match VECTOR_INDEX_TYPE={settings.VECTOR_INDEX_TYPE} and "
+            f"VECTOR_SEARCH_MODE={settings.VECTOR_SEARCH_MODE}: " + "; ".join(problems)
+        )
+
+
+def _compact_distance(query_embedding: List[float]):
+    """Distance on the quantized representation, matching the expression indexes."""
+    query = cast(literal(query_embedding, Vector(EMBEDDING_DIM)), Vector(EMBEDDING_DIM))
+    if settings.VECTOR_SEARCH_MODE == "halfvec":
+        return cast(DocumentChunk.embedding, HALFVEC(EMBEDDING_DIM)).cosine_distance(
+            cast(query, HALFVEC(EMBEDDING_DIM))
+        )
+    if settings.VECTOR_SEARCH_MODE == "binary":
+        return cast(func.binary_quantize(DocumentChunk.embedding), BIT(EMBEDDING_DIM)).hamming_distance(
+            cast(func.binary_quantize(query), BIT(EMBEDDING_DIM))
+        )
+    return None
+
+
+@traced("vector_search")
+async def search_chunks(
+    db: AsyncSession,
+    document_id: UUID,
+    query_embedding: List[float],
+    top_k: int | None = None,
+) -> List[RetrievedChunk]:
+    top_k = top_k or settings.RETRIEVAL_TOP_K
+    compact_distance = _compact_distance(query_embedding)
+    # Quantized modes fetch a wider candidate set from the compact index and
+    # re-rank it against the full-precision vectors.
+    candidate_limit = top_k if compact_distance is None else max(settings.VECTOR_RERANK_CANDIDATES, top_k)
+    await _set_search_params(db, candidate_limit)
+
+    distance = DocumentChunk.embedding.cosine_distance(query_embedding).label("distance")
+    candidates = (
+        select(
+            DocumentChunk.chunk_index,
+            DocumentChunk.content,
+            DocumentChunk.page_number,
+            DocumentChunk.section,
+            distance,
+        )
+        .where(DocumentChunk.document_id == document_id)
+        .order_by(distance if compact_distance is None else compact_distance)
+        .limit(candidate_limit)
+        .subquery()
+    )
+    # relaxed_order iterative scans may return rows slightly out of order
+    result = await db.execute(
+        select(candidates).order_by(candidates.c.distance).limit(top_k)
+    )
+
+    return [
+        RetrievedChunk(
+            chunk_index=row.chunk_index,
+            content=row.content,
+            page_number=row.page_number,
+            section=row.section,
+            distance=float(row.distance),
+        )
+        for row in result
+    ]
+
+
+# Must match the expression of ix_document_chunks_content_fts.
+_content_tsvector = func.to_tsvector(literal_column("'simple'::regconfig"), DocumentChunk.content)
+
+_TERM_RE = re.compile(r"\w[\w./-]*\w|\w", re.UNICODE)
+
+
+def _lexical_query(question: str) -> str:
+    # OR the terms together: a natural-language question rarely has every
+    # word in one chunk, but clause numbers and names should still match.
+    terms = dict.fromkeys(term.lower() for term in _TERM_RE.findall(question))
+    return " or ".join(terms)
+
+
+@traced("lexical_search")
+async def lexical_search_chunks(
+    db: AsyncSession,
+    document_id: UUID,
+    question: str,
+    limit: int,
+) -> List[RetrievedChunk]:
+    query_text = _lexical_query(question)
+    if not query_text:
+        return []
+
+    tsquery = func.websearch_to_tsquery(literal_column("'simple'::regconfig"), query_text)
+    rank = (
+        func.ts_rank_cd(_content_tsvector, tsquery)
+        + func.word_similarity(question, DocumentChunk.content)
+    ).label("rank")
+    result = await db.execute(
+        select(
+            DocumentChunk.chunk_index,
+            DocumentChunk.content,
+            DocumentChunk.page_number,
+            DocumentChunk.section,
+            rank,
+        )
+        .where(
+            DocumentChunk.document_id == document_id,
+            or_(
+                _content_tsvector.op("@@")(tsquery),
+                # pg_trgm word similarity catches misspelled names and terms
+                literal(question).op("<%")(DocumentChunk.content),
+            ),
+        )
+        .order_by(rank.desc())
+        .limit(limit)
+    )
+    return [
+        RetrievedChunk(
+            chunk_index=row.chunk_index,
+            content=row.content,
+            page_number=row.page_number,
+            section=row.section,
+            score=float(row.rank),
+        )
+        for row in result
+    ]
+
+
+def reciprocal_rank_fusion(
+    rankings: List[Tuple[List[RetrievedChunk], float]],
+    top_k: int,
+    k: int | None = None,
+) -> List[RetrievedChunk]:
+    k = k or settings.HYBRID_RRF_K
+    fused: Dict[int, RetrievedChunk] = {}
+    scores: Dict[int, float] = {}
+    for chunks, weight in rankings:
+        for rank, chunk in enumerate(chunks, start=1):
+            scores[chunk.chunk_index] = scores.get(chunk.chunk_index, 0.0) + weight / (k + rank)
+            existing = fused.get(chunk.chunk_index)
+            if existing is None or (existing.distance is None and chunk.distance is not None):
+                fused[chunk.chunk_index] = chunk
+
+    ordered = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    results = []
+    for chunk_index in ordered:
+        chunk = fused[chunk_index]
+        chunk.score = scores[chunk_index]
+        results.append(chunk)
+    return results
+
+
+async def _vector_branch(
+    document_id: UUID,
+    question: str,
+    limit: int,
+    query_embedding: List[float] | None,
+) -> List[RetrievedChunk]:
+    if query_embedding is None:
+        [query_embedding] = await embed_texts([question])
+    async with read_session_factory() as db:
+        return await search_chunks(db, document_id, query_embedding, top_k=limit)
+
+
+async def _lexical_branch(document_id: UUID, question: str, limit: int) -> List[RetrievedChunk]:
+    async with read_session_factory() as db:
+        return await lexical_search_chunks(db, document_id, question, limit)
+
+
+@traced("retrieve")
+async def retrieve_context(
+    document_id: UUID,
+    question: str,
+    top_k: int | None = None,
+    lexical_weight: float | None = None,
+    query_embedding: List[float] | None = None,
+) -> List[RetrievedChunk]:
+    """Hybrid retrieval: vector and lexical queries run concurrently and are fused with RRF."""
+    top_k = top_k or settings.RETRIEVAL_TOP_K
+    lexical_weight = settings.HYBRID_LEXICAL_WEIGHT if lexical_weight is None else lexical_weight
+    limit = max(settings.HYBRID_CANDIDATES, top_k)
+
+    branches = []
+    if lexical_weight < 1:
+        branches.append((_vector_branch(document_id, question, limit, query_embedding), 1 - lexical_weight))
+    if lexical_weight > 0:
+        branches.append((_lexical_branch(document_id, question, limit), lexical_weight))
+
+    results = await asyncio.gather(*(branch for branch, _ in branches))
+    rankings = [(chunks, weight) for chunks, (_, weight) in zip(results, branches)]
+    chunks = reciprocal_rank_fusion(rankings, top_k)
+    logger.info(
+        f"Retrieved {len(chunks)} chunks for document {document_id} "
+        f"(lexical_weight={lexical_weight}, candidates={[len(r) for r in results]})"
+    )
+    return chunks
+
+
+def format_context(chunks: List[RetrievedChunk]) -> str:
+    blocks = []
+    for chunk in chunks:
+        header = f"[page {chunk.page_number}"
+        if chunk.section:
+            header += f" | {chunk.section}"
+        header += "]"
+        blocks.append(f"{header}\n{chunk.content}")
+    return "\n\n".join(blocks)
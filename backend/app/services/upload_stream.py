@@ -0,0 +1,378 @@
+from __future__ import annotations
+import hashlib
+import uuid
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Tuple
+
+import anyio
+import magic
+from fastapi import HTTPException, Request, status
+from loguru import logger
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from app.config import get_settings
+
+settings = get_settings()
+
+# Room for the multipart boundaries and part headers around the file bytes.
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+ZIP_MIME_TYPE = "application/zip"
+
+
+@dataclass
+class StoredUpload:
+    """A file written to the upload directory, or a rejected one (error set, no path)."""
+
+    id: uuid.UUID
+    path: Path | None
+    original_filename: str | None
+    file_type: str | None
+    size: int
+    sha256: str
+    error: str | None = None
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit",
+    )
+
+
+@dataclass
+class _FileSink:
+    """Writes one file part to disk while hashing it.
+
+    The first sniff_bytes are held back until the MIME type is known, so a
+    rejected upload never touches the disk.
+    """
+
+    dest_dir: Path
+    original_filename: str | None
+    allowed_types: Dict[str, str]
+    max_bytes: int
+    sniff_bytes: int
+    skip_unsupported: bool = False
+    id: uuid.UUID = field(default_factory=uuid.uuid4)
+    path: Path | None = None
+    file_type: str | None = None
+    error: str | None = None
+    size: int = 0
+    _head: bytearray = field(default_factory=bytearray)
+    _hash: "hashlib._Hash" = field(default_factory=hashlib.sha256)
+    _file: anyio.AsyncFile | None = None
+
+    async def _open(self) -> None:
+        mime = magic.from_buffer(bytes(self._head), mime=True)
+        if mime not in self.allowed_types:
+            if not self.skip_unsupported:
+                raise HTTPException(status_code=400, detail="Only PDF or DOCX files are allowed")
+            # The rest of the part is read and dropped.
+            self.error = f"Unsupported file type {mime}"
+            self._head.clear()
+            return
+        self.file_type = self.allowed_types[mime]
+        self.path = self.dest_dir / f"{self.id}.{self.file_type}"
+        self._file = await anyio.open_file(self.path, "wb")
+        await self._file.write(bytes(self._head))
+        self._head.clear()
+
+    async def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise _too_large(self.max_bytes)
+        if self.error is not None:
+            return
+        self._hash.update(data)
+        if self._file is not None:
+            await self._file.write(data)
+            return
+        self._head += data
+        if len(self._head) >= self.sniff_bytes:
+            await self._open()
+
+    async def finish(self) -> StoredUpload:
+        if self._file is None and self.error is None:
+            await self._open()
+        if self.error is not None:
+            return StoredUpload(
+                id=self.id,
+                path=None,
+                original_filename=self.original_filename,
+                file_type=None,
+                size=self.size,
+                sha256="",
+                error=self.error,
+            )
+        await self._file.aclose()
+        self._file = None
+        return StoredUpload(
+            id=self.id,
+            path=self.path,
+            original_filename=self.original_filename,
+            file_type=self.file_type,
+            size=self.size,
+            sha256=self._hash.hexdigest(),
+        )
+
+    async def discard(self) -> None:
+        if self._file is not None:
+            await self._file.aclose()
+            self._file = None
+        if self.path is not None:
+            await anyio.Path(self.path).unlink(missing_ok=True)
+
+
+class _PartCollector:
+    """Turns python-multipart's synchronous callbacks into a list of events.
+
+    Callbacks only record; the events are applied after each write() so the
+    disk I/O can be awaited.
+    """
+
+    def __init__(self) -> None:
+        self.events: List[Tuple[str, bytes]] = []
+
+    def _record(self, kind: str):
+        def on_data(data: bytes, start: int, end: int) -> None:
+            self.events.append((kind, data[start:end]))
+
+        return on_data
+
+    def _mark(self, kind: str):
+        def on_event() -> None:
+            self.events.append((kind, b""))
+
+        return on_event
+
+    def callbacks(self) -> Dict[str, object]:
+        return {
+            "on_part_begin": self._mark("part_begin"),
+            "on_part_data": self._record("part_data"),
+            "on_part_end": self._mark("part_end"),
+            "on_header_field": self._record("header_field"),
+            "on_header_value": self._record("header_value"),
+            "on_header_end": self._mark("header_end"),
+            "on_headers_finished": self._mark("headers_finished"),
+        }
+
+
+async def receive_uploads(
+    request: Request,
+    dest_dir: Path,
+    allowed_types: Dict[str, str],
+    field_name: str = "file",
+    max_files: int = 1,
+    max_bytes: int | None = None,
+    skip_unsupported: bool = False,
+) -> List[StoredUpload]:
+    """Stream the multipart file parts of a request straight to dest_dir.
+
+    Each file is hashed and size-checked as it arrives; nothing larger than
+    one network chunk is held in memory. Files are named after a fresh id and
+    the sniffed file type. On any error every file written so far is removed.
+    With skip_unsupported, a file of a type not in allowed_types is returned
+    with its error set instead of failing the whole request.
+    """
+    max_bytes = max_bytes or settings.UPLOAD_MAX_BYTES
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit():
+        if int(content_length) > max_files * max_bytes + MULTIPART_OVERHEAD_BYTES:
+            raise _too_large(max_bytes)
+
+    collector = _PartCollector()
+    parser = MultipartParser(boundary, collector.callbacks())
+
+    stored: List[StoredUpload] = []
+    sink: _FileSink | None = None
+    headers: Dict[bytes, bytes] = {}
+    header_field = b""
+    header_value = b""
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            events, collector.events = collector.events, []
+            for kind, data in events:
+                if kind == "part_begin":
+                    headers, header_field, header_value = {}, b"", b""
+                elif kind == "header_field":
+                    header_field += data
+                elif kind == "header_value":
+                    header_value += data
+                elif kind == "header_end":
+                    headers[header_field.lower()] = header_value
+                    header_field, header_value = b"", b""
+                elif kind == "headers_finished":
+                    _, disposition = parse_options_header(headers.get(b"content-disposition", b""))
+                    name = disposition.get(b"name", b"").decode("utf-8", "replace")
+                    if name != field_name or b"filename" not in disposition:
+                        continue
+                    if len(stored) >= max_files:
+                        raise HTTPException(
+                            status_code=400,
+                            detail=f"At most {max_files} file(s) per upload",
+                        )
+                    sink = _FileSink(
+                        dest_dir=dest_dir,
+                        original_filename=disposition[b"filename"].decode("utf-8", "replace") or None,
+                        allowed_types=allowed_types,
+                        max_bytes=max_bytes,
+                        sniff_bytes=settings.UPLOAD_SNIFF_BYTES,
+                        skip_unsupported=skip_unsupported,
+                    )
+                elif kind == "part_data" and sink is not None:
+                    await sink.write(data)
+                elif kind == "part_end" and sink is not None:
+                    upload = await sink.finish()
+                    sink = None
+                    stored.append(upload)
+                    if upload.error:
+                        logger.info(f"Rejected upload {upload.original_filename}: {upload.error}")
+                    else:
+                        logger.info(f"Stored upload {upload.original_filename} ({upload.size} bytes) at {upload.path}")
+        parser.finalize()
+    except BaseException:
+        if sink is not None:
+            await sink.discard()
+        await discard_uploads(stored)
+        raise
+
+    if not stored:
+        raise HTTPException(status_code=400, detail=f"Missing file field '{field_name}'")
+    return stored
+
+
+async def discard_uploads(uploads: List[StoredUpload]) -> None:
+    for upload in uploads:
+        if upload.path is not None:
+            await anyio.Path(upload.path).unlink(missing_ok=True)
+
+
+def _rejected(name: str, size: int, error: str) -> StoredUpload:
+    return StoredUpload(
+        id=uuid.uuid4(), path=None, original_filename=name, file_type=None, size=size, sha256="", error=error
+    )
+
+
+def _extract_member(
+    archive: zipfile.ZipFile,
+    info: zipfile.ZipInfo,
+    dest_dir: Path,
+    allowed_types: Dict[str, str],
+    max_bytes: int,
+) -> StoredUpload:
+    name = PurePosixPath(info.filename).name
+    if info.file_size > max_bytes:
+        return _rejected(name, info.file_size, f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+
+    with archive.open(info) as src:
+        head = src.read(settings.UPLOAD_SNIFF_BYTES)
+        mime = magic.from_buffer(head, mime=True)
+        if mime not in allowed_types:
+            return _rejected(name, info.file_size, f"Unsupported file type {mime}")
+
+        upload_id = uuid.uuid4()
+        file_type = allowed_types[mime]
+        path = dest_dir / f"{upload_id}.{file_type}"
+        digest = hashlib.sha256(head)
+        size = len(head)
+        with open(path, "wb") as dst:
+            dst.write(head)
+            while block := src.read(1024 * 1024):
+                size += len(block)
+                # The sizes in the zip directory are not to be trusted.
+                if size > max_bytes:
+                    break
+                digest.update(block)
+                dst.write(block)
+        if size > max_bytes:
+            path.unlink(missing_ok=True)
+            return _rejected(name, size, f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+
+    return StoredUpload(
+        id=upload_id, path=path, original_filename=name, file_type=file_type, size=size, sha256=digest.hexdigest()
+    )
+
+
+def _extract_archive(
+    upload: StoredUpload,
+    dest_dir: Path,
+    allowed_types: Dict[str, str],
+    max_files: int,
+    max_bytes: int,
+) -> List[StoredUpload]:
+    extracted: List[StoredUpload] = []
+    try:
+        with zipfile.ZipFile(upload.path) as archive:
+            members = [
+                info
+                for info in archive.infolist()
+                if not info.is_dir()
+                and not info.filename.startswith("__MACOSX/")
+                and not PurePosixPath(info.filename).name.startswith(".")
+            ]
+            if len(members) > max_files:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"{upload.original_filename} holds {len(members)} files; at most {max_files} per upload",
+                )
+            for info in members:
+                extracted.append(_extract_member(archive, info, dest_dir, allowed_types, max_bytes))
+    except zipfile.BadZipFile as exc:
+        for item in extracted:
+            if item.path is not None:
+                item.path.unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail=f"{upload.original_filename} is not a valid zip archive: {exc}")
+    except BaseException:
+        for item in extracted:
+            if item.path is not None:
+                item.path.unlink(missing_ok=True)
+        raise
+    return extracted
+
+
+async def expand_archives(
+    uploads: List[StoredUpload],
+    dest_dir: Path,
+    allowed_types: Dict[str, str],
+    max_files: int,
+    max_bytes: int | None = None,
+) -> List[StoredUpload]:
+    """Replace each zip upload with the files inside it.
+
+    Members are sniffed and size-checked like uploaded parts; unsupported ones
+    come back rejected. Archives are removed once expanded, and on any error
+    every file from the uploads and the archives is removed.
+    """
+    max_bytes = max_bytes or settings.UPLOAD_MAX_BYTES
+    expanded: List[StoredUpload] = []
+    try:
+        for upload in uploads:
+            if upload.file_type != "zip":
+                expanded.append(upload)
+                continue
+            expanded.extend(
+                await anyio.to_thread.run_sync(
+                    _extract_archive, upload, dest_dir, allowed_types, max_files, max_bytes
+                )
+            )
+            await anyio.Path(upload.path).unlink(missing_ok=True)
+            logger.info(f"Expanded archive {upload.original_filename}")
+    except BaseException:
+        await discard_uploads(uploads + expanded)
+        raise
+    return expanded
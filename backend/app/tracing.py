@@ -0,0 +1,334 @@
+"""Lightweight request tracing.
+
+A trace is started per HTTP request (TracingMiddleware) or per background
+job (trace()), and services open nested spans with span() or @traced. The
+current trace and span live in contextvars, so spans follow the request
+through awaits and into tasks it creates; outside a trace span() is a no-op.
+
+Each request gets an X-Request-ID (taken from the request if present) that is
+added to every loguru record, and a Server-Timing header summarising the
+spans finished before the response started. Finished traces are exported from
+a background thread as JSON lines (TRACE_EXPORT_FILE) and/or OTLP/HTTP JSON
+(TRACE_OTLP_ENDPOINT).
+"""
+from __future__ import annotations
+import functools
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List
+
+import httpx
+from loguru import logger
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.config import get_settings
+
+settings = get_settings()
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    parent_id: str | None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    span_id: str = field(default_factory=lambda: _new_id(8))
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int | None = None
+    error: str | None = None
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+@dataclass
+class Trace:
+    root: Span
+    request_id: str
+    spans: List[Span] = field(default_factory=list)
+
+    @property
+    def trace_id(self) -> str:
+        return self.root.trace_id
+
+    def server_timing(self) -> str:
+        """Finished spans summed by name, plus the time so far as "app"."""
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            if span.end_ns is not None:
+                totals[span.name] = totals.get(span.name, 0.0) + span.duration_ms
+        entries = [f"{name};dur={ms:.1f}" for name, ms in totals.items()]
+        entries.append(f"app;dur={self.root.duration_ms:.1f}")
+        return ", ".join(entries)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "request_id": self.request_id,
+            **self.root.to_dict(),
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+
+_current_trace: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+def current_request_id() -> str | None:
+    active = _current_trace.get()
+    return active.request_id if active is not None else None
+
+
+def add_log_context(record) -> None:
+    """loguru patcher: tags records with the current request id."""
+    active = _current_trace.get()
+    if active is not None:
+        record["extra"]["request_id"] = active.request_id
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span | None]:
+    active = _current_trace.get()
+    if active is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    current = Span(name, active.trace_id, parent.span_id if parent else active.root.span_id, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.error = type(exc).__name__
+        raise
+    finally:
+        current.end()
+        _current_span.reset(token)
+        active.spans.append(current)
+
+
+def traced(name: str):
+    """Wrap an async function in a span."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def trace(
+    name: str,
+    request_id: str | None = None,
+    trace_id: str | None = None,
+    parent_id: str | None = None,
+    **attributes: Any,
+) -> Iterator[Trace]:
+    root = Span(name, trace_id or _new_id(16), parent_id, attributes)
+    current = Trace(root=root, request_id=request_id or uuid.uuid4().hex)
+    trace_token = _current_trace.set(current)
+    span_token = _current_span.set(root)
+    try:
+        yield current
+    except BaseException as exc:
+        root.error = type(exc).__name__
+        raise
+    finally:
+        root.end()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        exporter.export(current)
+
+
+def _parse_traceparent(value: str | None) -> tuple[str | None, str | None]:
+    # W3C trace context: version-traceid-parentid-flags
+    parts = (value or "").split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+        return parts[1], parts[2]
+    return None, None
+
+
+class TracingMiddleware:
+    """Starts a trace per HTTP request and adds X-Request-ID and Server-Timing headers."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not settings.TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        trace_id, parent_id = _parse_traceparent(headers.get("traceparent"))
+        # Client-supplied ids end up in logs and headers; keep them short.
+        request_id = (headers.get(REQUEST_ID_HEADER) or "")[:64] or uuid.uuid4().hex
+
+        with trace(
+            f"{scope['method']} {scope['path']}",
+            request_id=request_id,
+            trace_id=trace_id,
+            parent_id=parent_id,
+        ) as current:
+
+            async def send_wrapper(message) -> None:
+                if message["type"] == "http.response.start":
+                    current.root.attributes["http.status_code"] = message["status"]
+                    response_headers = MutableHeaders(scope=message)
+                    response_headers.append(REQUEST_ID_HEADER, request_id)
+                    response_headers.append("Server-Timing", current.server_timing())
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    current.root.name = f"{scope['method']} {route.path}"
+                current.root.attributes["http.method"] = scope["method"]
+                current.root.attributes["http.target"] = scope["path"]
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(span: Span, trace_id: str, kind: int) -> Dict[str, Any]:
+    payload = {
+        "traceId": trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns or span.start_ns),
+        "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+        # STATUS_CODE_ERROR = 2, STATUS_CODE_UNSET = 0
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 0},
+    }
+    if span.parent_id:
+        payload["parentSpanId"] = span.parent_id
+    return payload
+
+
+def otlp_payload(traces: List[Trace]) -> Dict[str, Any]:
+    spans = []
+    for current in traces:
+        # SPAN_KIND_SERVER = 2, SPAN_KIND_INTERNAL = 1
+        spans.append(_otlp_span(current.root, current.trace_id, kind=2))
+        spans.extend(_otlp_span(span, current.trace_id, kind=1) for span in current.spans)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [{"key": "service.name", "value": {"stringValue": settings.TRACE_SERVICE_NAME}}]
+                },
+                "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+class TraceExporter:
+    """Ships finished traces from a daemon thread so exporting never blocks the event loop."""
+
+    MAX_BATCH = 256
+
+    def __init__(self) -> None:
+        self._queue: queue.SimpleQueue[Trace | None] = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(settings.TRACE_EXPORT_FILE or settings.TRACE_OTLP_ENDPOINT)
+
+    def start(self) -> None:
+        if self._thread is not None or not self.enabled:
+            return
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    def export(self, current: Trace) -> None:
+        if self._thread is not None:
+            self._queue.put(current)
+
+    def _run(self) -> None:
+        client = httpx.Client(timeout=5.0) if settings.TRACE_OTLP_ENDPOINT else None
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while len(batch) < self.MAX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = None in batch
+            traces = [current for current in batch if current is not None]
+            if traces:
+                self._write(traces, client)
+        if client is not None:
+            client.close()
+
+    def _write(self, traces: List[Trace], client: httpx.Client | None) -> None:
+        if settings.TRACE_EXPORT_FILE:
+            try:
+                with open(settings.TRACE_EXPORT_FILE, "a", encoding="utf-8") as f:
+                    for current in traces:
+                        f.write(json.dumps(current.to_dict(), default=str) + "\n")
+            except OSError as exc:
+                logger.warning(f"Could not write traces to {settings.TRACE_EXPORT_FILE}: {exc}")
+        if client is not None:
+            try:
+                client.post(settings.TRACE_OTLP_ENDPOINT, json=otlp_payload(traces)).raise_for_status()
+            except httpx.HTTPError as exc:
+                logger.warning(f"Could not export {len(traces)} traces to {settings.TRACE_OTLP_ENDPOINT}: {exc}")
+
+
+exporter = TraceExporter()
@@ -0,0 +1,50 @@
+"""Run the benchmark suite, or a subset of it, with default parameters.
+
+    POSTGRES_HOST=localhost python -m benchmarks
+    POSTGRES_HOST=localhost python -m benchmarks search_latency chat_ttfb --output /tmp/bench
+
+Each benchmark writes its own JSON file; run one module directly to change
+its parameters.
+"""
+import argparse
+import importlib
+import sys
+import traceback
+
+from benchmarks._common import add_output_argument
+
+SUITE = {
+    "chunking": "benchmarks.bench_chunking",
+    "chunk_insert": "benchmarks.bench_chunk_insert",
+    "ingestion": "benchmarks.bench_ingestion",
+    "search_latency": "benchmarks.bench_search_latency",
+    "quantized_search": "benchmarks.bench_quantized_search",
+    "chat_ttfb": "benchmarks.bench_chat_ttfb",
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("benchmarks", nargs="*", metavar="name", help=f"any of: {', '.join(SUITE)}")
+    add_output_argument(parser)
+    args = parser.parse_args()
+    unknown = [name for name in args.benchmarks if name not in SUITE]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    failed = []
+    for name in args.benchmarks or list(SUITE):
+        print(f"== {name}")
+        try:
+            importlib.import_module(SUITE[name]).main(["--output", str(args.output)])
+        except Exception:  # noqa: BLE001
+            traceback.print_exc()
+            failed.append(name)
+
+    if failed:
+        print(f"failed: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
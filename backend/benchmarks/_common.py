@@ -0,0 +1,120 @@
+"""Shared helpers: synthetic text, latency summaries and JSON result files.
+
+Every benchmark writes one JSON file per run to benchmarks/results/ (or
+--output), named <benchmark>-<UTC timestamp>.json, holding the parameters,
+the git commit and the settings that affect performance, so runs can be
+compared over time.
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.config import get_settings
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Settings whose value changes what a benchmark measures.
+RECORDED_SETTINGS = (
+    "EMBEDDING_BACKEND",
+    "EMBEDDING_ONNX_FILE",
+    "EMBEDDING_MAX_BATCH_SIZE",
+    "EMBEDDING_MAX_WAIT_MS",
+    "CHUNKING_STRATEGY",
+    "EXTRACTION_PROCESSES",
+    "EXTRACTION_PAGES_PER_TASK",
+    "INGESTION_EMBED_BATCH_SIZE",
+    "CHUNK_INSERT_BATCH_SIZE",
+    "VECTOR_INDEX_TYPE",
+    "VECTOR_SEARCH_MODE",
+    "VECTOR_ITERATIVE_SCAN",
+    "HNSW_EF_SEARCH",
+    "IVFFLAT_PROBES",
+    "OLLAMA_MAX_CONCURRENT",
+    "MESSAGE_SINK_MAX_BATCH_SIZE",
+    "MESSAGE_SINK_FLUSH_INTERVAL_MS",
+)
+
+WORDS = (
+    "agreement party supplier customer shall deliver services payment invoice term notice "
+    "liability indemnify confidential information breach termination warranty schedule "
+    "obligation reasonable written consent days month fees law court dispute"
+).split()
+
+
+def synthetic_sentence() -> str:
+    words = random.choices(WORDS, k=random.randint(8, 40))
+    return words[0].capitalize() + " " + " ".join(words[1:]) + "."
+
+
+def synthetic_paragraph(min_sentences: int = 1, max_sentences: int = 6) -> str:
+    return " ".join(synthetic_sentence() for _ in range(random.randint(min_sentences, max_sentences)))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def latency_summary(latencies_ms: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(latencies_ms),
+        "mean_ms": round(statistics.mean(latencies_ms), 2),
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p90_ms": round(percentile(latencies_ms, 90), 2),
+        "p95_ms": round(percentile(latencies_ms, 95), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "max_ms": round(max(latencies_ms), 2),
+    }
+
+
+def add_output_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=RESULTS_DIR,
+        help="directory for the JSON result file (default: benchmarks/results)",
+    )
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(
+    benchmark: str,
+    params: Dict[str, Any],
+    results: Dict[str, Any],
+    output_dir: Path = RESULTS_DIR,
+) -> Path:
+    settings = get_settings()
+    now = datetime.now(timezone.utc)
+    payload = {
+        "benchmark": benchmark,
+        "timestamp": now.isoformat(),
+        "git_commit": _git_commit(),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "settings": {name: getattr(settings, name) for name in RECORDED_SETTINGS},
+        "params": {key: str(value) if isinstance(value, Path) else value for key, value in params.items()},
+        "results": results,
+    }
+    output_dir.mkdir(parents=True, exist_ok=True)
+    path = output_dir / f"{benchmark}-{now.strftime('%Y%m%dT%H%M%SZ')}.json"
+    path.write_text(json.dumps(payload, indent=2, default=str))
+    print(f"results written to {path}")
+    return path
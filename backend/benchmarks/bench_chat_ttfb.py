@@ -0,0 +1,224 @@
+"""/chat/stream time-to-first-byte against a local stub of Ollama's /api/chat.
+
+Starts an in-process stub that streams NDJSON chat chunks with a fixed
+first-token delay and inter-token gap, starts the API with uvicorn pointed
+at the stub, and times requests against a throwaway document. TTFB minus the
+stub's first-token delay is the API's own overhead (retrieval, embedding,
+queueing, persistence). Needs a local pgvector instance with migrations
+applied and the embedding model on disk:
+
+    POSTGRES_HOST=localhost python -m benchmarks.bench_chat_ttfb --requests 100 --concurrency 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from app.db import async_session_factory, engine
+from app.services.chunk_store import build_chunk_records, copy_chunks
+from benchmarks._common import (
+    add_output_argument,
+    latency_summary,
+    synthetic_paragraph,
+    synthetic_sentence,
+    write_results,
+)
+from benchmarks.bench_chunk_insert import _create_document, _drop_document, random_unit_vector
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def create_stub_ollama(first_token_ms: float, token_ms: float, tokens: int) -> FastAPI:
+    stub = FastAPI()
+
+    @stub.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        model = body.get("model", "stub")
+        words = [random.choice(("the", "supplier", "shall", "pay", "within", "days")) + " " for _ in range(tokens)]
+
+        if not body.get("stream", True):
+            await asyncio.sleep((first_token_ms + token_ms * tokens) / 1000)
+            return {"model": model, "message": {"role": "assistant", "content": "".join(words)}, "done": True}
+
+        async def lines():
+            await asyncio.sleep(first_token_ms / 1000)
+            for n, word in enumerate(words):
+                if n:
+                    await asyncio.sleep(token_ms / 1000)
+                yield json.dumps(
+                    {"model": model, "message": {"role": "assistant", "content": word}, "done": False}
+                ) + "\n"
+            yield json.dumps(
+                {
+                    "model": model,
+                    "message": {"role": "assistant", "content": ""},
+                    "done": True,
+                    "eval_count": tokens,
+                    "eval_duration": int(token_ms * tokens * 1e6),
+                }
+            ) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    return stub
+
+
+async def _wait_for_app(client: httpx.AsyncClient, process: subprocess.Popen | None, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"API exited with code {process.returncode} during startup")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"API did not become healthy within {timeout:.0f}s")
+
+
+async def _create_corpus(chunks: int) -> tuple:
+    document_id = await _create_document()
+    rows = [(i, synthetic_paragraph(3, 8), i // 4 + 1, "") for i in range(chunks)]
+    async with async_session_factory() as db:
+        await copy_chunks(db, build_chunk_records(document_id, rows, [random_unit_vector() for _ in rows]))
+        await db.commit()
+    return document_id, f"benchmark-{document_id}.pdf"
+
+
+async def _timed_request(client: httpx.AsyncClient, filename: str) -> dict:
+    payload = {"document_filename": filename, "question": synthetic_sentence()}
+    started = time.perf_counter()
+    async with client.stream("POST", "/chat/stream", json=payload) as resp:
+        headers_at = time.perf_counter()
+        first_byte_at = None
+        body_bytes = 0
+        async for chunk in resp.aiter_raw():
+            if first_byte_at is None and chunk:
+                first_byte_at = time.perf_counter()
+            body_bytes += len(chunk)
+        done_at = time.perf_counter()
+    return {
+        "status": resp.status_code,
+        "headers_ms": (headers_at - started) * 1000,
+        "ttfb_ms": ((first_byte_at or done_at) - started) * 1000,
+        "total_ms": (done_at - started) * 1000,
+        "bytes": body_bytes,
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    document_id, filename = await _create_corpus(args.chunks)
+    stub_server = uvicorn.Server(
+        uvicorn.Config(
+            create_stub_ollama(args.first_token_ms, args.token_ms, args.tokens),
+            host="127.0.0.1",
+            port=args.stub_port,
+            log_level="warning",
+        )
+    )
+    stub_task = asyncio.create_task(stub_server.serve())
+
+    process = None
+    app_url = args.app_url
+    if app_url is None:
+        app_url = f"http://127.0.0.1:{args.app_port}"
+        env = {
+            **os.environ,
+            "OLLAMA_HOST": "127.0.0.1",
+            "OLLAMA_PORT": str(args.stub_port),
+            # Every question would otherwise be a miss anyway; keep stores off the timed path.
+            "ANSWER_CACHE_ENABLED": "false",
+        }
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+             "--port", str(args.app_port), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+            env=env,
+        )
+
+    try:
+        timeout = httpx.Timeout(120.0)
+        async with httpx.AsyncClient(base_url=app_url, timeout=timeout) as client:
+            await _wait_for_app(client, process, args.startup_timeout)
+            for _ in range(3):
+                await _timed_request(client, filename)
+
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def limited():
+                async with semaphore:
+                    return await _timed_request(client, filename)
+
+            started = time.perf_counter()
+            samples = await asyncio.gather(*(limited() for _ in range(args.requests)))
+            elapsed = time.perf_counter() - started
+    finally:
+        await _drop_document(document_id)
+        await engine.dispose()
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        stub_server.should_exit = True
+        await stub_task
+
+    ok = [s for s in samples if s["status"] == 200]
+    results = {
+        "requests": len(samples),
+        "ok": len(ok),
+        "statuses": {
+            str(code): sum(1 for s in samples if s["status"] == code) for code in {s["status"] for s in samples}
+        },
+        "requests_per_sec": round(len(samples) / elapsed, 2),
+    }
+    if ok:
+        results["headers"] = latency_summary([s["headers_ms"] for s in ok])
+        results["ttfb"] = latency_summary([s["ttfb_ms"] for s in ok])
+        results["overhead"] = latency_summary([s["ttfb_ms"] - args.first_token_ms for s in ok])
+        results["total"] = latency_summary([s["total_ms"] for s in ok])
+    return results
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--chunks", type=int, default=500, help="chunks in the benchmark document")
+    parser.add_argument("--first-token-ms", type=float, default=50.0)
+    parser.add_argument("--token-ms", type=float, default=5.0)
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--stub-port", type=int, default=11499)
+    parser.add_argument("--app-port", type=int, default=8099)
+    parser.add_argument(
+        "--app-url",
+        default=None,
+        help="benchmark an already running API instead; its OLLAMA_HOST/PORT must point at the stub",
+    )
+    parser.add_argument("--startup-timeout", type=float, default=180.0)
+    add_output_argument(parser)
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    print(f"{results['ok']}/{results['requests']} ok, {results['requests_per_sec']} req/s, statuses {results['statuses']}")
+    for name in ("headers", "ttfb", "overhead", "total"):
+        if name in results:
+            summary = results[name]
+            print(f"{name:>9}: p50={summary['p50_ms']:8.2f} ms  p95={summary['p95_ms']:8.2f} ms  p99={summary['p99_ms']:8.2f} ms")
+    params = {key: value for key, value in vars(args).items() if key != "output"}
+    write_results("chat_ttfb", params, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Compare chunk insert throughput: per-row ORM adds vs. COPY.
+
+Needs a local pgvector instance with migrations applied, e.g.
+
+    POSTGRES_HOST=localhost python -m benchmarks.bench_chunk_insert --rows 5000
+"""
+import argparse
+import asyncio
+import math
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import List
+
+from sqlalchemy import delete
+
+from app.db import async_session_factory, engine
+from app.models import Document, DocumentChunk
+from app.services.chunk_store import build_chunk_records, copy_chunks
+from benchmarks._common import add_output_argument, write_results
+
+DIM = 384
+
+
+def random_unit_vector() -> List[float]:
+    vec = [random.gauss(0.0, 1.0) for _ in range(DIM)]
+    norm = math.sqrt(sum(v * v for v in vec))
+    return [v / norm for v in vec]
+
+
+def synthetic_chunks(rows: int):
+    chunks = [(i, f"Clause {i}. " + "lorem ipsum dolor sit amet " * 40, i // 4 + 1, "") for i in range(rows)]
+    embeddings = [random_unit_vector() for _ in range(rows)]
+    return chunks, embeddings
+
+
+async def _create_document(file_type: str = "pdf", filename: str | None = None) -> uuid.UUID:
+    document_id = uuid.uuid4()
+    async with async_session_factory() as db:
+        db.add(
+            Document(
+                id=document_id,
+                filename=filename or f"benchmark-{document_id}.{file_type}",
+                original_filename=f"benchmark.{file_type}",
+                file_type=file_type,
+                status="ready",
+                uploaded_at=datetime.now(timezone.utc),
+            )
+        )
+        await db.commit()
+    return document_id
+
+
+async def _drop_document(document_id: uuid.UUID) -> None:
+    async with async_session_factory() as db:
+        await db.execute(delete(Document).where(Document.id == document_id))
+        await db.commit()
+
+
+async def insert_orm(document_id: uuid.UUID, chunks, embeddings, batch_size: int) -> float:
+    started = time.perf_counter()
+    async with async_session_factory() as db:
+        for n, ((idx, content, page_number, section), emb) in enumerate(zip(chunks, embeddings), start=1):
+            db.add(
+                DocumentChunk(
+                    document_id=document_id,
+                    chunk_index=idx,
+                    content=content,
+                    embedding=emb,
+                    page_number=page_number,
+                    section=section,
+                )
+            )
+            if n % batch_size == 0:
+                await db.commit()
+        await db.commit()
+    return time.perf_counter() - started
+
+
+async def insert_copy(document_id: uuid.UUID, chunks, embeddings, batch_size: int) -> float:
+    records = build_chunk_records(document_id, chunks, embeddings)
+    started = time.perf_counter()
+    async with async_session_factory() as db:
+        for start in range(0, len(records), batch_size):
+            await copy_chunks(db, records[start:start + batch_size])
+            await db.commit()
+    return time.perf_counter() - started
+
+
+async def run(rows: int, batch_size: int) -> dict:
+    chunks, embeddings = synthetic_chunks(rows)
+    results = {}
+    for name, insert in (("orm", insert_orm), ("copy", insert_copy)):
+        document_id = await _create_document()
+        try:
+            elapsed = await insert(document_id, chunks, embeddings, batch_size)
+        finally:
+            await _drop_document(document_id)
+        results[name] = {"seconds": round(elapsed, 3), "rows_per_sec": round(rows / elapsed, 1)}
+    await engine.dispose()
+    return results
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    add_output_argument(parser)
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args.rows, args.batch_size))
+    for name, result in results.items():
+        print(f"{name:>5}: {result['rows_per_sec']:>10.1f} rows/s ({result['seconds']}s for {args.rows} rows)")
+    results["speedup"] = round(results["copy"]["rows_per_sec"] / results["orm"]["rows_per_sec"], 2)
+    print(f"speedup: {results['speedup']:.1f}x")
+    write_results("chunk_insert", {"rows": args.rows, "batch_size": args.batch_size}, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
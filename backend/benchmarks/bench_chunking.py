@@ -0,0 +1,126 @@
+"""Chunking throughput and fit to the embedding window, per strategy.
+
+Generates a large synthetic contract, chunks it with the previous
+string-concatenating paragraph chunker and with each CHUNKING_STRATEGY, and
+reports time, chunk count, and how many chunks the model would truncate.
+Only the embedding tokenizer is loaded, not the model:
+
+    EMBEDDING_MODEL_PATH=./models/MiniLM-L12-V2 python -m benchmarks.bench_chunking --pages 2000
+"""
+import argparse
+import random
+import statistics
+import time
+from typing import List, Tuple
+
+from app.services.chunking import SPECIAL_TOKENS, TokenCounter, chunk_paragraphs, get_chunker
+from app.services.model_registry import model_registry
+from benchmarks._common import WORDS, add_output_argument, synthetic_paragraph, write_results
+
+STRATEGIES = ("paragraph", "token", "sentence", "clause")
+
+
+def synthetic_document(pages: int) -> List[Tuple[int, str]]:
+    paragraphs = []
+    clause = 0
+    for page in range(1, pages + 1):
+        if page % 3 == 1:
+            clause += 1
+            paragraphs.append((page, f"ARTICLE {clause} {random.choice(WORDS).upper()}"))
+        for sub in range(1, random.randint(3, 7)):
+            # A few run-on paragraphs, as PDF extraction often produces.
+            body = synthetic_paragraph(20, 60) if random.random() < 0.1 else synthetic_paragraph()
+            paragraphs.append((page, f"{clause}.{sub} {body}"))
+    return paragraphs
+
+
+def legacy_paragraph_chunking(
+    paragraphs: List[Tuple[int, str]], max_chars: int = 1200, overlap_chars: int = 200
+) -> List[Tuple[int, str, int, str]]:
+    """The chunker ingestion used before app.services.chunking, for comparison."""
+    chunks = []
+    buffer = ""
+    current_page = 0
+    current_section = ""
+    idx = 0
+    for page_number, para in paragraphs:
+        if para.isupper() and len(para.split()) < 10:
+            current_section = para
+        if not buffer:
+            buffer = para
+            current_page = page_number
+        elif len(buffer) + 2 + len(para) <= max_chars:
+            buffer = buffer + "\n\n" + para
+        else:
+            chunks.append((idx, buffer, current_page, current_section))
+            idx += 1
+            if len(para) > max_chars:
+                start = 0
+                while start < len(para):
+                    end = min(start + max_chars, len(para))
+                    chunks.append((idx, para[start:end], page_number, current_section))
+                    idx += 1
+                    if end == len(para):
+                        break
+                    start = max(0, end - overlap_chars)
+                buffer = ""
+            else:
+                buffer = para
+                current_page = page_number
+    if buffer:
+        chunks.append((idx, buffer, current_page, current_section))
+    return chunks
+
+
+def report(name: str, chunks, elapsed: float, counter: TokenCounter, window: int) -> dict:
+    lengths = [counter(content) + SPECIAL_TOKENS for _, content, _, _ in chunks]
+    truncated = [n for n in lengths if n > window]
+    dropped = sum(n - window for n in truncated)
+    result = {
+        "ms": round(elapsed * 1000, 1),
+        "chunks": len(chunks),
+        "tokens_p50": statistics.median(lengths),
+        "tokens_max": max(lengths),
+        "truncated_ratio": round(len(truncated) / len(lengths), 4),
+        "tokens_lost_ratio": round(dropped / sum(lengths), 4),
+    }
+    print(
+        f"{name:>10}: {result['ms']:8.1f} ms  chunks={len(chunks):6d}  "
+        f"tokens p50={result['tokens_p50']:5.0f} max={result['tokens_max']:5d}  "
+        f"truncated={result['truncated_ratio']:6.1%}  tokens lost={result['tokens_lost_ratio']:6.1%}"
+    )
+    return result
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES, default=list(STRATEGIES))
+    add_output_argument(parser)
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    paragraphs = synthetic_document(args.pages)
+    chars = sum(len(p) for _, p in paragraphs)
+    counter = TokenCounter(model_registry.tokenizer)
+    window = model_registry.max_seq_length
+    print(f"{len(paragraphs)} paragraphs, {chars / 1e6:.1f}M chars, model window {window} tokens")
+
+    results = {}
+    started = time.perf_counter()
+    chunks = legacy_paragraph_chunking(paragraphs)
+    results["legacy"] = report("legacy", chunks, time.perf_counter() - started, counter, window)
+
+    for strategy in args.strategies:
+        chunker = get_chunker(strategy)
+        started = time.perf_counter()
+        chunks = chunk_paragraphs(paragraphs, chunker)
+        results[strategy] = report(strategy, chunks, time.perf_counter() - started, counter, window)
+
+    params = {"pages": args.pages, "seed": args.seed, "paragraphs": len(paragraphs), "chars": chars}
+    write_results("chunking", params, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Ingestion throughput through process_and_store_document_chunks.
+
+Generates PDF and DOCX files of synthetic contract text, runs each through
+the full extract -> chunk -> embed -> COPY pipeline into a throwaway
+document, and reports pages/s, chunks/s and embedding batches/s. The text is
+random per run, so the embedding cache does not short-circuit the model.
+Needs a local pgvector instance with migrations applied and the embedding
+model on disk:
+
+    POSTGRES_HOST=localhost python -m benchmarks.bench_ingestion --pages 50 200
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from sqlalchemy import func, select
+
+from app.db import async_session_factory, engine
+from app.models import DocumentChunk
+from app.services.embedding import embedding_batcher, embedding_cache, process_and_store_document_chunks
+from app.services.extraction import shutdown_executor
+from app.services.model_registry import model_registry
+from benchmarks._common import add_output_argument, synthetic_paragraph, write_results
+from benchmarks.bench_chunk_insert import _create_document, _drop_document
+
+FORMATS = ("pdf", "docx")
+
+# Letter-size page with Helvetica 10pt on 12pt leading.
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+LINES_PER_PAGE = 60
+CHARS_PER_LINE = 95
+
+
+def _wrap(text: str) -> List[str]:
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + 1 + len(word) > CHARS_PER_LINE:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def minimal_pdf(pages: List[List[str]]) -> bytes:
+    """A PDF with one uncompressed text stream per page in a base-14 font.
+
+    Like most text PDFs, pypdf extracts each page as line-wrapped text without
+    blank lines, so the chunker sees one long paragraph per page.
+    """
+    objects: List[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",  # page tree, filled in once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for paragraphs in pages:
+        ops = ["BT", "/F1 10 Tf", "12 TL", f"50 {PAGE_HEIGHT - 50} Td"]
+        for para in paragraphs:
+            for line in _wrap(para):
+                ops.append(f"({_pdf_escape(line)}) Tj T*")
+            ops.append("T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % (PAGE_WIDTH, PAGE_HEIGHT, content_ref)
+        )
+        page_refs.append(len(objects))
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_refs))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def synthetic_pages(page_count: int) -> List[List[str]]:
+    pages = []
+    for page in range(1, page_count + 1):
+        paragraphs, lines = [], 0
+        if page % 3 == 1:
+            paragraphs.append(f"ARTICLE {page // 3 + 1} TERMS")
+            lines += 2
+        while True:
+            para = f"{page}.{len(paragraphs) + 1} {synthetic_paragraph()}"
+            lines += len(_wrap(para)) + 1
+            if lines > LINES_PER_PAGE:
+                break
+            paragraphs.append(para)
+        pages.append(paragraphs)
+    return pages
+
+
+def write_pdf(path: Path, pages: List[List[str]]) -> None:
+    path.write_bytes(minimal_pdf(pages))
+
+
+def write_docx(path: Path, pages: List[List[str]]) -> None:
+    import docx
+
+    document = docx.Document()
+    for paragraphs in pages:
+        for para in paragraphs:
+            document.add_paragraph(para)
+    document.save(str(path))
+
+
+async def ingest(path: Path, file_type: str, page_count: int) -> dict:
+    document_id = await _create_document(file_type=file_type, filename=str(path))
+    batches_before = embedding_batcher.batches_total
+    encoded_before = embedding_cache.misses
+    try:
+        started = time.perf_counter()
+        async with async_session_factory() as db:
+            await process_and_store_document_chunks(path, str(document_id), db=db, file_type=file_type)
+        elapsed = time.perf_counter() - started
+
+        async with async_session_factory() as db:
+            chunks = await db.scalar(
+                select(func.count()).select_from(DocumentChunk).where(DocumentChunk.document_id == document_id)
+            )
+    finally:
+        await _drop_document(document_id)
+
+    batches = embedding_batcher.batches_total - batches_before
+    return {
+        "seconds": round(elapsed, 3),
+        "pages": page_count,
+        "chunks": chunks,
+        "texts_encoded": embedding_cache.misses - encoded_before,
+        "embed_batches": batches,
+        "pages_per_sec": round(page_count / elapsed, 2),
+        "chunks_per_sec": round(chunks / elapsed, 2),
+        "embed_batches_per_sec": round(batches / elapsed, 2),
+        "file_bytes": path.stat().st_size,
+    }
+
+
+async def run(page_counts: List[int], formats: List[str]) -> dict:
+    await asyncio.to_thread(model_registry.load)
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench-ingestion-") as tmp:
+            for page_count in page_counts:
+                pages = synthetic_pages(page_count)
+                for file_type in formats:
+                    path = Path(tmp) / f"contract-{page_count}.{file_type}"
+                    (write_pdf if file_type == "pdf" else write_docx)(path, pages)
+                    results[f"{file_type}-{page_count}"] = await ingest(path, file_type, page_count)
+    finally:
+        await embedding_batcher.stop()
+        shutdown_executor()
+        await engine.dispose()
+    return results
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, nargs="+", default=[20, 100])
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--seed", type=int, default=None)
+    add_output_argument(parser)
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    results = asyncio.run(run(args.pages, args.formats))
+    print(f"{'run':>10} {'pages/s':>9} {'chunks/s':>9} {'batches/s':>10} {'chunks':>7} {'seconds':>8}")
+    for name, result in results.items():
+        print(
+            f"{name:>10} {result['pages_per_sec']:>9.2f} {result['chunks_per_sec']:>9.2f} "
+            f"{result['embed_batches_per_sec']:>10.2f} {result['chunks']:>7d} {result['seconds']:>8.2f}"
+        )
+    write_results("ingestion", {"pages": args.pages, "formats": args.formats, "seed": args.seed}, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
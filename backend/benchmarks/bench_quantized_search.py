@@ -0,0 +1,128 @@
+"""Recall vs. latency of full, halfvec and binary-quantized vector search.
+
+Loads a synthetic clustered corpus into a throwaway document, builds any
+missing quantized expression indexes, and compares each VECTOR_SEARCH_MODE
+against exact (sequential scan) top-k results:
+
+    POSTGRES_HOST=localhost python -m benchmarks.bench_quantized_search --rows 20000
+"""
+import argparse
+import asyncio
+import math
+import random
+import statistics
+import time
+from typing import List
+
+from sqlalchemy import select, text
+
+from app.config import get_settings
+from app.db import async_session_factory, engine
+from app.models import DocumentChunk, quantized_embedding_indexes
+from app.services.chunk_store import build_chunk_records, copy_chunks
+from app.services.retrieval import search_chunks
+from benchmarks._common import add_output_argument, percentile, write_results
+from benchmarks.bench_chunk_insert import DIM, _create_document, _drop_document
+
+MODES = ("full", "halfvec", "binary")
+
+
+def _normalize(vec: List[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vec))
+    return [v / norm for v in vec]
+
+
+def clustered_vectors(count: int, clusters: int, spread: float = 0.35) -> List[List[float]]:
+    # Sentence embeddings cluster by topic; uniform noise would understate recall.
+    centroids = [[random.gauss(0.0, 1.0) for _ in range(DIM)] for _ in range(clusters)]
+    return [
+        _normalize([c + random.gauss(0.0, spread) for c in random.choice(centroids)])
+        for _ in range(count)
+    ]
+
+
+async def _ensure_indexes() -> None:
+    settings = get_settings()
+    original_mode = settings.VECTOR_SEARCH_MODE
+    async with engine.begin() as conn:
+        for mode in ("halfvec", "binary"):
+            settings.VECTOR_SEARCH_MODE = mode
+            for index in quantized_embedding_indexes(DocumentChunk.__table__.c.embedding):
+                await conn.run_sync(lambda sync_conn: index.create(sync_conn, checkfirst=True))
+        await conn.execute(text("ANALYZE document_chunks"))
+    settings.VECTOR_SEARCH_MODE = original_mode
+
+
+async def _exact_top_k(document_id, query: List[float], top_k: int) -> List[int]:
+    async with async_session_factory() as db:
+        await db.execute(text("SET LOCAL enable_indexscan = off"))
+        distance = DocumentChunk.embedding.cosine_distance(query)
+        result = await db.execute(
+            select(DocumentChunk.chunk_index)
+            .where(DocumentChunk.document_id == document_id)
+            .order_by(distance)
+            .limit(top_k)
+        )
+        return [row.chunk_index for row in result]
+
+
+async def run(rows: int, queries: int, top_k: int, candidates: int) -> dict:
+    settings = get_settings()
+    settings.VECTOR_RERANK_CANDIDATES = candidates
+
+    vectors = clustered_vectors(rows + queries, clusters=max(rows // 200, 8))
+    corpus, query_vectors = vectors[:rows], vectors[rows:]
+    chunks = [(i, f"chunk {i}", 1, "") for i in range(rows)]
+
+    document_id = await _create_document()
+    try:
+        async with async_session_factory() as db:
+            records = build_chunk_records(document_id, chunks, corpus)
+            for start in range(0, len(records), 2000):
+                await copy_chunks(db, records[start:start + 2000])
+            await db.commit()
+        await _ensure_indexes()
+
+        truth = [await _exact_top_k(document_id, q, top_k) for q in query_vectors]
+
+        results = {}
+        for mode in MODES:
+            settings.VECTOR_SEARCH_MODE = mode
+            latencies, recalls = [], []
+            for query, expected in zip(query_vectors, truth):
+                async with async_session_factory() as db:
+                    started = time.perf_counter()
+                    hits = await search_chunks(db, document_id, query, top_k=top_k)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                found = {hit.chunk_index for hit in hits}
+                recalls.append(len(found & set(expected)) / len(expected))
+            results[mode] = {
+                "recall_at_k": round(statistics.mean(recalls), 4),
+                "p50_ms": round(percentile(latencies, 50), 2),
+                "p95_ms": round(percentile(latencies, 95), 2),
+            }
+    finally:
+        await _drop_document(document_id)
+        await engine.dispose()
+    return results
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=40)
+    add_output_argument(parser)
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args.rows, args.queries, args.top_k, args.candidates))
+    print(f"{'mode':>8} {'recall@' + str(args.top_k):>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for mode, result in results.items():
+        print(f"{mode:>8} {result['recall_at_k']:>10.3f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f}")
+    params = {"rows": args.rows, "queries": args.queries, "top_k": args.top_k, "candidates": args.candidates}
+    write_results("quantized_search", params, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Vector search latency percentiles at several corpus sizes.
+
+For each size, loads a synthetic clustered corpus into a throwaway document
+and times search_chunks with the configured index and VECTOR_SEARCH_MODE,
+sequentially and with --concurrency parallel queries (each on its own
+session, as concurrent /chat/stream requests would be):
+
+    POSTGRES_HOST=localhost python -m benchmarks.bench_search_latency --sizes 1000 10000 50000
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import List
+
+from sqlalchemy import text
+
+from app.db import async_session_factory, engine
+from app.services.chunk_store import build_chunk_records, copy_chunks
+from app.services.retrieval import search_chunks
+from benchmarks._common import add_output_argument, latency_summary, write_results
+from benchmarks.bench_chunk_insert import _create_document, _drop_document
+from benchmarks.bench_quantized_search import clustered_vectors
+
+
+async def _load_corpus(document_id, vectors: List[List[float]]) -> None:
+    chunks = [(i, f"chunk {i}", i // 4 + 1, "") for i in range(len(vectors))]
+    records = build_chunk_records(document_id, chunks, vectors)
+    async with async_session_factory() as db:
+        for start in range(0, len(records), 2000):
+            await copy_chunks(db, records[start:start + 2000])
+        await db.commit()
+    async with engine.begin() as conn:
+        await conn.execute(text("ANALYZE document_chunks"))
+
+
+async def _timed_search(document_id, query: List[float], top_k: int) -> float:
+    async with async_session_factory() as db:
+        started = time.perf_counter()
+        await search_chunks(db, document_id, query, top_k=top_k)
+        return (time.perf_counter() - started) * 1000
+
+
+async def _measure(document_id, queries: List[List[float]], top_k: int, concurrency: int) -> dict:
+    # One untimed query warms the connection pool and the index pages.
+    await _timed_search(document_id, queries[0], top_k)
+
+    sequential = [await _timed_search(document_id, query, top_k) for query in queries]
+    result = {"sequential": latency_summary(sequential)}
+
+    if concurrency > 1:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(query):
+            async with semaphore:
+                return await _timed_search(document_id, query, top_k)
+
+        started = time.perf_counter()
+        concurrent = await asyncio.gather(*(limited(query) for query in queries))
+        elapsed = time.perf_counter() - started
+        result["concurrent"] = latency_summary(list(concurrent))
+        result["concurrent"]["queries_per_sec"] = round(len(queries) / elapsed, 1)
+    return result
+
+
+async def run(sizes: List[int], queries: int, top_k: int, concurrency: int) -> dict:
+    results = {}
+    try:
+        for size in sizes:
+            vectors = clustered_vectors(size + queries, clusters=max(size // 200, 8))
+            document_id = await _create_document()
+            try:
+                await _load_corpus(document_id, vectors[:size])
+                results[str(size)] = await _measure(document_id, vectors[size:], top_k, concurrency)
+            finally:
+                await _drop_document(document_id)
+    finally:
+        await engine.dispose()
+    return results
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=7)
+    add_output_argument(parser)
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    results = asyncio.run(run(args.sizes, args.queries, args.top_k, args.concurrency))
+    print(f"{'rows':>8} {'run':>11} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for size, result in results.items():
+        for name, summary in result.items():
+            print(f"{size:>8} {name:>11} {summary['p50_ms']:>8.2f} {summary['p95_ms']:>8.2f} {summary['p99_ms']:>8.2f}")
+    params = {
+        "sizes": args.sizes,
+        "queries": args.queries,
+        "top_k": args.top_k,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+    }
+    write_results("search_latency", params, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,38 @@ python -m app.prestart
 echo "Running database migrations..."
 alembic upgrade head
 
-echo "Starting FastAPI with Uvicorn..."
-exec uvicorn app.main:app --host 0.0.0.0 --port 8000
+# Read by the app too: host-wide budgets (DB pool, Ollama limiter, ingestion
+# workers, extraction processes) are split between the workers.
+export API_WORKERS="${API_WORKERS:-1}"
 
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    # Samples from a previous run would be summed into this one.
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
+if [ -n "$EMBEDDING_WORKER_SOCKET" ]; then
+    echo "Starting embedding worker on $EMBEDDING_WORKER_SOCKET..."
+    # Restarted if it dies; API workers reconnect on their next request.
+    (
+        while true; do
+            python -m app.embedding_worker || true
+            echo "Embedding worker exited, restarting in 2 seconds..."
+            sleep 2
+        done
+    ) &
+
+    for _ in $(seq 1 120); do
+        [ -S "$EMBEDDING_WORKER_SOCKET" ] && break
+        sleep 1
+    done
+    if [ ! -S "$EMBEDDING_WORKER_SOCKET" ]; then
+        echo "Embedding worker did not open $EMBEDDING_WORKER_SOCKET" >&2
+        exit 1
+    fi
+elif [ "$API_WORKERS" -gt 1 ]; then
+    echo "API_WORKERS=$API_WORKERS without EMBEDDING_WORKER_SOCKET loads the model in every worker" >&2
+fi
+
+echo "Starting FastAPI with Uvicorn ($API_WORKERS workers)..."
+exec uvicorn app.main:app --host 0.0.0.0 --port 8000 --workers "$API_WORKERS"
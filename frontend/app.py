@@ -1,7 +1,34 @@
+import json
+
 import streamlit as st
 import requests
 
 BACKEND_URL = "http://backend:8000/api"
+PAGE_SIZE = 200  # the backend's largest page
+
+
+def fetch_pages(path, items_key=None):
+    """Fetch every page of a list endpoint by following X-Next-Cursor.
+
+    With items_key, pages are objects whose items_key list is paginated
+    (a conversation's messages); otherwise each page is the list itself.
+    """
+    params = {"limit": PAGE_SIZE}
+    result = None
+    while True:
+        response = requests.get(f"{BACKEND_URL}{path}", params=params, timeout=30)
+        response.raise_for_status()
+        page = response.json()
+        if result is None:
+            result = page
+        elif items_key:
+            result[items_key].extend(page[items_key])
+        else:
+            result.extend(page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return result
+        params["cursor"] = cursor
 
 st.set_page_config(page_title="Streaming Chat & Upload", layout="wide")
 st.title("💬 سیستم چت با قابلیت آپلود فایل")
@@ -35,21 +62,41 @@ with st.sidebar:
                     response = requests.post(
                         f"{BACKEND_URL}/documents/upload",
                         files=files,
-                        timeout=300,
+                        timeout=60,
                     )
                     response.raise_for_status()
-                    st.success(f"✅ فایل با موفقیت آپلود شد!")
+                    st.session_state.pending_document_id = response.json()["id"]
+                    st.success(f"✅ فایل آپلود شد و در صف پردازش قرار گرفت.")
 
                 except requests.exceptions.RequestException as e:
                     st.error(f"❌ خطا در آپلود: {e}")
 
+    pending_document_id = st.session_state.get("pending_document_id")
+    if pending_document_id:
+        try:
+            response = requests.get(
+                f"{BACKEND_URL}/documents/{pending_document_id}/status",
+                timeout=10,
+            )
+            response.raise_for_status()
+            job_status = response.json()
+            if job_status["status"] == "ready":
+                st.success("✅ پردازش فایل به پایان رسید.")
+                st.session_state.pending_document_id = None
+            elif job_status["status"] == "failed":
+                st.error(f"❌ پردازش فایل ناموفق بود: {job_status.get('error')}")
+                st.session_state.pending_document_id = None
+            else:
+                st.info(f"⏳ وضعیت پردازش فایل: {job_status['status']}")
+                st.button("به‌روزرسانی وضعیت", use_container_width=True)
+        except requests.exceptions.RequestException as e:
+            st.error(f"❌ خطا در دریافت وضعیت پردازش: {e}")
+
     st.markdown("---")
     st.header("📂 لیست داکیومنت‌ها")
 
     try:
-        response = requests.get(f"{BACKEND_URL}/documents")
-        response.raise_for_status()
-        documents = response.json()
+        documents = fetch_pages("/documents")
     except requests.exceptions.RequestException as e:
         st.error(f"❌ خطا در دریافت لیست داکیومنت‌ها: {e}")
         documents = []
@@ -57,9 +104,11 @@ with st.sidebar:
     doc_options = {"هیچ منبعی": None}
     for d in documents:
         label = f"{d['original_filename'].split('/')[-1]} ({d['file_type']})"
+        if d["status"] != "ready":
+            label += f" - {d['status']}"
         doc_options[label] = d
 
-    if "selected_document_label" not in st.session_state:
+    if st.session_state.get("selected_document_label") not in doc_options:
         st.session_state.selected_document_label = "هیچ منبعی"
 
     selected_doc_label = st.selectbox(
@@ -81,9 +130,7 @@ with st.sidebar:
 
     def fetch_conversations():
         try:
-            response = requests.get(f"{BACKEND_URL}/conversations")
-            response.raise_for_status()
-            return response.json()
+            return fetch_pages("/conversations")
         except requests.exceptions.RequestException as e:
             st.error(f"❌ خطا در دریافت لیست مکالمات: {e}")
             return []
@@ -94,7 +141,8 @@ with st.sidebar:
         conv_label = f"{conv['title']}"
         conv_options[conv_label] = conv['id']
 
-    if "selected_conversation_label" not in st.session_state:
+    if st.session_state.get("selected_conversation_label") not in conv_options:
+        # The selected conversation is gone (deleted, or the list failed to load).
         st.session_state.selected_conversation_label = "ایجاد مکالمه جدید"
 
     selected_conv_label = st.selectbox(
@@ -116,9 +164,7 @@ if "messages" not in st.session_state:
 
 if st.session_state.conversation_id and not st.session_state.messages:
     try:
-        response = requests.get(f"{BACKEND_URL}/conversations/{st.session_state.conversation_id}")
-        response.raise_for_status()
-        conv_data = response.json()
+        conv_data = fetch_pages(f"/conversations/{st.session_state.conversation_id}", items_key="messages")
         st.session_state.messages = [
             {"role": m["role"], "content": m["content"]} for m in conv_data.get("messages", [])
         ]
@@ -144,12 +190,15 @@ if question:
     payload = {
         "question": question,
         "conversation_id": st.session_state.conversation_id,
-        "document_filename": selected_document["filename"] if selected_document else None
+        "document_filename": selected_document["filename"] if selected_document else None,
+        "format": "ndjson",
     }
 
     with st.chat_message("assistant"):
         placeholder = st.empty()
         full_text = ""
+        stats = {}
+        stream_error = None
 
         try:
             with requests.post(
@@ -165,14 +214,25 @@ if question:
                         r.headers["X-Conversation-Id"]
                     )
 
-                for chunk in r.iter_content(chunk_size=None):
-                    if not chunk:
+                # One JSON event per line: token events, then done (or error).
+                for line in r.iter_lines():
+                    if not line:
                         continue
-                    text = chunk.decode("utf-8")
-                    full_text += text
-                    placeholder.markdown(full_text + "▌")
+                    event = json.loads(line)
+                    if event["type"] == "token":
+                        full_text += event["content"]
+                        placeholder.markdown(full_text + "▌")
+                    elif event["type"] == "done":
+                        st.session_state.conversation_id = event["conversation_id"]
+                        stats = event.get("stats", {})
+                    elif event["type"] == "error":
+                        stream_error = event.get("detail")
 
             placeholder.markdown(full_text)
+            if stream_error:
+                st.error(f"❌ خطا در تولید پاسخ: {stream_error}")
+            elif stats.get("tokens_per_second"):
+                st.caption(f"⏱️ {stats['eval_count']} توکن، {stats['tokens_per_second']} توکن در ثانیه")
             st.session_state.messages.append({"role": "assistant", "content": full_text})
             
         except requests.exceptions.RequestException as e:
@@ -24,6 +24,8 @@ mkdir -p "$BASE_DIR/Qwen3-0.6B-GGUF"
 cd "$BASE_DIR/Qwen3-0.6B-GGUF"
 
 wget -c "https://huggingface.co/MaziyarPanahi/Qwen3-0.6B-GGUF/resolve/main/Qwen3-0.6B.Q4_K_M.gguf"
+# The backend counts chat history tokens with the model's own tokenizer.
+wget -c "https://huggingface.co/Qwen/Qwen3-0.6B/resolve/main/tokenizer.json"
 
 # Optionally, you can use Q3_K_M or Q2_K versions instead:
 # wget -c "https://huggingface.co/MaziyarPanahi/Qwen3-0.6B-GGUF/resolve/main/Qwen3-0.6B.Q2_K.gguf"